@@ -4,6 +4,10 @@ import json
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import SystemMessage, HumanMessage
+from rate_limiter import PRIORITY_DIRECTOR, estimate_tokens, gemini_limiter
+
+# Reserved for the JSON timeline the model writes back
+TIMELINE_OUTPUT_TOKENS = 2048
 
 # Define the structure for a single scene in the video
 class VideoScene(TypedDict):
@@ -18,12 +22,15 @@ class AgentState(TypedDict):
     timeline: List[VideoScene]
 
 class VideoDirector:
-    def __init__(self):
-        if not os.getenv("GOOGLE_API_KEY"):
-            raise ValueError("GOOGLE_API_KEY not found in environment variables")
-        
-        # Using a model capable of good JSON output
-        self.llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7)
+    def __init__(self, llm=None, limiter=None):
+        if llm is None:
+            if not os.getenv("GOOGLE_API_KEY"):
+                raise ValueError("GOOGLE_API_KEY not found in environment variables")
+            
+            # Using a model capable of good JSON output
+            llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7)
+        self.llm = llm
+        self.limiter = limiter or gemini_limiter()
         self.graph = self._build_graph()
 
     def _build_graph(self):
@@ -78,10 +85,16 @@ class VideoDirector:
             user_prompt = f"Create a video timeline based on this request:\n\n{request}"
             
             # Force JSON mode by prompting (Gemini is good at this, but explicit instruction helps)
-            response = self.llm.invoke([
+            messages = [
                 SystemMessage(content=system_prompt),
                 HumanMessage(content=user_prompt + "\n\nReturn ONLY the valid JSON array.")
-            ])
+            ]
+            # Director calls jump the queue ahead of vision verification
+            response = self.limiter.call(
+                lambda: self.llm.invoke(messages),
+                tokens=estimate_tokens(system_prompt + user_prompt) + TIMELINE_OUTPUT_TOKENS,
+                priority=PRIORITY_DIRECTOR,
+            )
             
             content = response.content.replace('```json', '').replace('```', '').strip()
             try:
@@ -14,6 +14,10 @@ def main():
     prompt = st.sidebar.text_area("What is the video about?", height=150, 
                                   placeholder="E.g. 3 Secret Dog Meanings... \n[0:05] Hook...")
     
+    render_backend = st.sidebar.selectbox("Render backend", ["moviepy", "ffmpeg"],
+                                          index=1 if os.getenv("RENDER_BACKEND") == "ffmpeg" else 0,
+                                          help="ffmpeg renders the whole timeline in one filtergraph (faster).")
+    
     generate_btn = st.sidebar.button("🎥 Generate Video", type="primary")
 
     # Main Content
@@ -33,7 +37,8 @@ def main():
             with st.spinner("Agent is working..."):
                 try:
                     orch = VideoOrchestrator()
-                    result = orch.create_video(prompt, progress_callback=update_progress)
+                    result = orch.create_video(prompt, progress_callback=update_progress,
+                                               render_backend=render_backend)
                     
                     st.success("Video Created Successfully!")
                     
@@ -0,0 +1,165 @@
+"""
+Persistent, content-addressed store for downloaded stock media.
+
+Files live under <root>/objects/<sha[:2]>/<sha><ext> and are shared by every
+session and process. index.json maps lookup keys (provider id, download URL) to
+content hashes and tracks, per object, its size, last use and the sessions
+currently holding it. Sessions hold objects through leases, so a crashed worker
+cannot pin files forever. When the store grows past its quota, unreferenced
+objects are evicted least recently used first.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Callable, Optional
+
+from file_utils import atomic_write_json, file_lock
+
+class AssetStore:
+    def __init__(self, root: str = "data/assets", quota_mb: Optional[float] = None,
+                 lease_hours: Optional[float] = None):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.tmp_dir = os.path.join(root, "tmp")
+        self.index_path = os.path.join(root, "index.json")
+        self.quota_bytes = int(float(quota_mb or os.getenv("ASSET_STORE_MB", "5120")) * 2**20)
+        self.lease_seconds = float(lease_hours or os.getenv("ASSET_LEASE_HOURS", "6")) * 3600
+        self.session_id = None
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def _load(self) -> dict:
+        try:
+            with open(self.index_path, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {"keys": {}, "objects": {}}
+
+    def _save(self, index: dict):
+        atomic_write_json(self.index_path, index)
+
+    def _object_path(self, sha: str, ext: str) -> str:
+        return os.path.join(self.objects_dir, sha[:2], sha + ext)
+
+    def _hold(self, obj: dict):
+        obj["last_used"] = time.time()
+        if self.session_id:
+            obj.setdefault("refs", {})[self.session_id] = time.time() + self.lease_seconds
+
+    @staticmethod
+    def _link(src: str, dest: str) -> str:
+        """Hard link (no copy) into the session directory; copies across filesystems."""
+        if os.path.exists(dest):
+            os.remove(dest)
+        try:
+            os.link(src, dest)
+        except OSError:
+            shutil.copyfile(src, dest)
+        return dest
+
+    def begin_session(self, session_id: str):
+        self.session_id = session_id
+
+    def end_session(self):
+        """Drops this session's references and collects garbage if over quota."""
+        if not self.session_id:
+            return
+        with file_lock(self.index_path):
+            index = self._load()
+            for obj in index["objects"].values():
+                obj.get("refs", {}).pop(self.session_id, None)
+            self._gc(index)
+            self._save(index)
+        self.session_id = None
+
+    def lookup(self, keys: list) -> Optional[str]:
+        """Content hash stored under any of keys, if known (read-only, no lock)."""
+        index = self._load()
+        for key in keys:
+            if index["keys"].get(key) in index["objects"]:
+                return index["keys"][key]
+        return None
+
+    def get(self, keys: list, dest: str) -> Optional[str]:
+        """Places a stored copy at dest if any key is known. Returns dest, or None on a miss."""
+        with file_lock(self.index_path):
+            index = self._load()
+            for key in keys:
+                sha = index["keys"].get(key)
+                obj = index["objects"].get(sha)
+                if not obj:
+                    continue
+                path = self._object_path(sha, obj["ext"])
+                if not os.path.exists(path):
+                    # Removed behind our back; forget it
+                    del index["objects"][sha]
+                    continue
+                self._hold(obj)
+                for k in keys:
+                    index["keys"][k] = sha
+                self._save(index)
+                return self._link(path, dest)
+        return None
+
+    def put(self, keys: list, dest: str, download: Callable[[str], bool]) -> Optional[str]:
+        """
+        Calls download(tmp_path), stores the result under its content hash and places
+        it at dest. Returns dest, or None if the download fails.
+        """
+        ext = os.path.splitext(dest)[1]
+        tmp_path = os.path.join(self.tmp_dir, f"{uuid.uuid4().hex}{ext}")
+        try:
+            if not download(tmp_path):
+                return None
+            sha = hashlib.sha256()
+            with open(tmp_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(2**20), b""):
+                    sha.update(chunk)
+            sha = sha.hexdigest()
+            path = self._object_path(sha, ext)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            with file_lock(self.index_path):
+                index = self._load()
+                if not os.path.exists(path):
+                    # Same bytes under another key keep the existing object
+                    os.replace(tmp_path, path)
+                obj = index["objects"].setdefault(sha, {"ext": ext, "size": os.path.getsize(path)})
+                self._hold(obj)
+                for key in keys:
+                    index["keys"][key] = sha
+                self._gc(index)
+                self._save(index)
+                return self._link(path, dest)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _gc(self, index: dict):
+        """Evicts unreferenced objects, least recently used first, until under quota. Lock held."""
+        now = time.time()
+        total = sum(obj["size"] for obj in index["objects"].values())
+        if total <= self.quota_bytes:
+            return
+        for obj in index["objects"].values():
+            # Leases of sessions that never released (crash) expire
+            obj["refs"] = {sid: until for sid, until in obj.get("refs", {}).items() if until > now}
+        idle = sorted((obj["last_used"], sha) for sha, obj in index["objects"].items() if not obj["refs"])
+        evicted = 0
+        for _, sha in idle:
+            if total <= self.quota_bytes:
+                break
+            obj = index["objects"].pop(sha)
+            try:
+                os.remove(self._object_path(sha, obj["ext"]))
+            except FileNotFoundError:
+                pass
+            total -= obj["size"]
+            evicted += 1
+        if evicted:
+            live = set(index["objects"])
+            index["keys"] = {k: sha for k, sha in index["keys"].items() if sha in live}
+            print(f"   🗑️ Asset store: evicted {evicted} objects ({total / 2**20:.0f} MB left)")
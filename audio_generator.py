@@ -1,15 +1,151 @@
 import asyncio
+import bisect
 import edge_tts
 import os
 import json
+import wave
+from typing import List, Optional, Tuple
+
+from ffmpeg_tools import run_ffmpeg
+
+# MPEG audio header tables (Layer III only; edge-tts emits 24 kHz MPEG-2 Layer III)
+_MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],  # MPEG-1
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],      # MPEG-2 / 2.5
+}
+_MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+def _mp3_frames(data: bytes) -> Optional[list]:
+    """
+    Splits an MP3 byte stream into frames without decoding.
+    The first frame must start the data (or follow an ID3v2 tag) and every frame must
+    be followed directly by the next header, with the same version and sample rate.
+    Only a trailing ID3v1 tag or a truncated last frame may end the stream early.
+    Returns [(offset, length, seconds)], or None if this is not Layer III MP3.
+    """
+    pos = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        pos = 10 + size + (10 if data[5] & 0x10 else 0)  # optional footer
+    frames = []
+    stream = None
+    while pos + 4 <= len(data):
+        if data[pos:pos + 3] == b"TAG" and len(data) - pos == 128:
+            break  # ID3v1
+        b1, b2 = data[pos + 1], data[pos + 2]
+        if data[pos] != 0xFF or (b1 & 0xE0) != 0xE0:
+            return None
+        version = (b1 >> 3) & 0x03  # 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+        layer = (b1 >> 1) & 0x03
+        bitrate_idx = (b2 >> 4) & 0x0F
+        rate_idx = (b2 >> 2) & 0x03
+        if version == 1 or layer != 1 or bitrate_idx in (0, 15) or rate_idx == 3:
+            return None
+        if stream is None:
+            stream = (version, rate_idx)
+        elif stream != (version, rate_idx):
+            return None
+        bitrate = _MP3_BITRATES[1 if version == 3 else 2][bitrate_idx] * 1000
+        sample_rate = _MP3_SAMPLE_RATES[version][rate_idx]
+        padding = (b2 >> 1) & 0x01
+        samples = 1152 if version == 3 else 576
+        length = (samples // 8) * bitrate // sample_rate + padding
+        if pos + length > len(data):
+            break  # truncated last frame
+        frames.append((pos, length, samples / sample_rate))
+        pos += length
+    return frames or None
+
+def mp3_duration(path: str) -> Optional[float]:
+    """Duration from the MP3 frame headers (no decode); None if the file is not parseable MP3."""
+    with open(path, "rb") as f:
+        frames = _mp3_frames(f.read())
+    return sum(seconds for _, _, seconds in frames) if frames else None
+
+# Decode format of the ffmpeg fallback track (MoviePy's default audio rate)
+TRACK_SAMPLE_RATE = 44100
+TRACK_CHANNELS = 2
+
+def _mp3_signature(data: bytes, offset: int) -> tuple:
+    """Stream parameters that must match for MP3 frames to be joined as is (version/layer, rate, mono)."""
+    return data[offset + 1] & 0xFE, (data[offset + 2] >> 2) & 0x03, (data[offset + 3] >> 6) == 3
+
+def _is_tag_frame(data: bytes, offset: int, length: int) -> bool:
+    """Xing/Info/VBRI frames describe the whole file; kept mid-track they would be heard as a gap."""
+    head = data[offset:offset + min(length, 64)]
+    return b"Xing" in head or b"Info" in head or b"VBRI" in head
+
+def build_narration_track(audio_paths: List[str], output_base: str) -> Tuple[str, List[float]]:
+    """
+    Joins per-scene narration into the one continuous track the final mux takes.
+    MP3 scenes with matching stream parameters are joined frame by frame (no decode,
+    <output_base>.mp3); otherwise one ffmpeg run decodes every scene to PCM and the
+    samples are joined into <output_base>.wav.
+    Returns (track path, scene durations). Durations count whole frames/samples, so
+    scene offsets on the video timeline match the track exactly (no drift).
+    """
+    scenes = []
+    for path in audio_paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        frames = _mp3_frames(data)
+        if not frames:
+            scenes = None
+            break
+        if len(frames) > 1 and _is_tag_frame(data, frames[0][0], frames[0][1]):
+            frames = frames[1:]
+        scenes.append((data, frames))
+    if scenes and len({_mp3_signature(data, frames[0][0]) for data, frames in scenes}) == 1:
+        track_path = output_base + ".mp3"
+        durations = []
+        with open(track_path, "wb") as f:
+            for data, frames in scenes:
+                for offset, length, _ in frames:
+                    f.write(data[offset:offset + length])
+                durations.append(sum(seconds for _, _, seconds in frames))
+        return track_path, durations
+
+    print("   🎚️ Narration formats differ; decoding scenes once with ffmpeg.")
+    raw_paths = [f"{output_base}_{i}.pcm" for i in range(len(audio_paths))]
+    args = []
+    for path in audio_paths:
+        args += ["-i", path]
+    for i, raw_path in enumerate(raw_paths):
+        args += ["-map", f"{i}:a", "-ar", str(TRACK_SAMPLE_RATE), "-ac", str(TRACK_CHANNELS),
+                 "-c:a", "pcm_s16le", "-f", "s16le", raw_path]
+    track_path = output_base + ".wav"
+    durations = []
+    try:
+        run_ffmpeg(args)
+        with wave.open(track_path, "wb") as track:
+            track.setnchannels(TRACK_CHANNELS)
+            track.setsampwidth(2)
+            track.setframerate(TRACK_SAMPLE_RATE)
+            for raw_path in raw_paths:
+                with open(raw_path, "rb") as f:
+                    pcm = f.read()
+                track.writeframesraw(pcm)
+                durations.append(len(pcm) // (2 * TRACK_CHANNELS) / TRACK_SAMPLE_RATE)
+    finally:
+        for raw_path in raw_paths:
+            if os.path.exists(raw_path):
+                os.remove(raw_path)
+    return track_path, durations
 
 class AudioGenerator:
     def __init__(self):
         self.voice = "en-US-ChristopherNeural"
         self.rate = "+15%" # Slightly faster for Shorts
 
+    def _communicate(self, text: str):
+        try:
+            # edge-tts >= 7 defaults to sentence boundaries; subtitles need words
+            return edge_tts.Communicate(text, self.voice, rate=self.rate, boundary="WordBoundary")
+        except TypeError:
+            return edge_tts.Communicate(text, self.voice, rate=self.rate)
+
     async def _generate_with_subs(self, text: str, output_file: str):
-        communicate = edge_tts.Communicate(text, self.voice, rate=self.rate)
+        communicate = self._communicate(text)
         subtitles = []
         
         with open(output_file, "wb") as file:
@@ -46,3 +182,82 @@ class AudioGenerator:
         except Exception as e:
             print(f"   ❌ Error generating audio: {e}")
             raise
+
+    def generate_scene_narratives(self, scripts: List[str], output_dir: str, prefix: str = "audio"):
+        """
+        One-shot mode: synthesizes all scene scripts in ONE TTS stream, then splits it
+        into per-scene files using the word boundaries (cuts land in the pause between scenes).
+        MP3 is split on frame boundaries without re-encoding; ffmpeg is only used if the
+        stream cannot be parsed. Falls back to one request per scene if words cannot be
+        mapped back to scenes.
+        Returns: [(audio_path, subtitles_json_path), ...] in scene order, with each
+        scene's subtitles rebased to start at zero.
+        """
+        full_path = os.path.join(output_dir, f"{prefix}_full.mp3")
+        joined = " ".join(scripts)
+        print(f"   🎙️ Generating audio for {len(scripts)} scenes in one pass (Voice: {self.voice})...")
+        subtitles = asyncio.run(self._generate_with_subs(joined, full_path))
+
+        # Map every word back to its scene through its character position in the joined text
+        scene_starts = []
+        cursor = 0
+        for script in scripts:
+            scene_starts.append(cursor)
+            cursor += len(script) + 1
+        scene_words = [[] for _ in scripts]
+        cursor, scene = 0, 0
+        for sub in subtitles:
+            pos = joined.find(sub["word"], cursor)
+            if pos >= 0:
+                cursor = pos + len(sub["word"])
+                scene = bisect.bisect_right(scene_starts, pos) - 1
+            scene_words[scene].append(sub)
+
+        if any(not words for words in scene_words):
+            print("   ⚠️ Could not align words to every scene. Falling back to per-scene audio.")
+            os.remove(full_path)
+            return [self.generate_narrative(script, os.path.join(output_dir, f"{prefix}_{i}.mp3"))
+                    for i, script in enumerate(scripts)]
+
+        # Cut halfway through the gap between the last word of a scene and the first of the next
+        cuts = [0.0]
+        for prev, nxt in zip(scene_words, scene_words[1:]):
+            cuts.append((prev[-1]["end"] + nxt[0]["start"]) / 2)
+
+        with open(full_path, "rb") as f:
+            data = f.read()
+        frames = _mp3_frames(data)
+        edges = [0.0]  # frame start times
+        for _, _, seconds in frames or []:
+            edges.append(edges[-1] + seconds)
+
+        results = []
+        for i, words in enumerate(scene_words):
+            audio_path = os.path.join(output_dir, f"{prefix}_{i}.mp3")
+            subs_path = os.path.join(output_dir, f"{prefix}_{i}.json")
+            if frames:
+                # Snap cuts to frame boundaries; the segment's real start rebases its subtitles
+                first = bisect.bisect_left(edges, cuts[i] - 1e-9) if i else 0
+                last = bisect.bisect_left(edges, cuts[i + 1] - 1e-9) if i + 1 < len(cuts) else len(frames)
+                first = min(first, len(frames) - 1)
+                last = max(last, first + 1)
+                start = edges[first]
+                begin, end = frames[first][0], frames[last - 1][0] + frames[last - 1][1]
+                with open(audio_path, "wb") as f:
+                    f.write(data[begin:end])
+            else:
+                start = cuts[i]
+                args = ["-ss", f"{start:.3f}", "-i", full_path]
+                if i + 1 < len(cuts):
+                    args += ["-t", f"{cuts[i + 1] - start:.3f}"]
+                run_ffmpeg(args + ["-c:a", "libmp3lame", audio_path])
+
+            rebased = [{"start": round(max(0.0, w["start"] - start), 3),
+                        "end": round(max(0.0, w["end"] - start), 3),
+                        "word": w["word"]} for w in words]
+            with open(subs_path, "w") as f:
+                json.dump(rebased, f)
+            results.append((os.path.abspath(audio_path), os.path.abspath(subs_path)))
+
+        os.remove(full_path)
+        return results
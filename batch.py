@@ -0,0 +1,200 @@
+"""
+Resumable parallel batch runner.
+
+Reads prompts from a JSONL file and renders each one with VideoOrchestrator on a
+process pool. Progress is tracked in a manifest so an interrupted run can be
+restarted with the same command and only unfinished prompts are processed:
+
+    python batch.py prompts.jsonl --workers 4
+    python batch.py prompts.jsonl --workers 4          # resume after a crash
+
+Each line is either a JSON string (the prompt) or an object with a "prompt" field
+(or "title"/"body", as in requests.jsonl). "request_id"/"id" name the item;
+otherwise a hash of the prompt is used.
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from file_utils import atomic_write_json
+
+load_dotenv()
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+_orchestrator = None
+_log_dir = None
+
+def load_prompts(path: str, prompt_field: Optional[str] = None) -> List[Tuple[str, str]]:
+    """Returns [(item_id, prompt)] in file order. Malformed lines are reported and skipped."""
+    items = []
+    seen = set()
+    with open(path, "r") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"⚠️ Line {line_no}: invalid JSON ({e}), skipped.")
+                continue
+
+            if isinstance(obj, str):
+                prompt, item_id = obj, None
+            else:
+                if prompt_field:
+                    prompt = obj.get(prompt_field)
+                elif obj.get("prompt"):
+                    prompt = obj["prompt"]
+                else:
+                    prompt = "\n\n".join(p for p in (obj.get("title"), obj.get("body")) if p)
+                item_id = obj.get("request_id") or obj.get("id")
+
+            if not prompt:
+                print(f"⚠️ Line {line_no}: no prompt found, skipped.")
+                continue
+            item_id = str(item_id or hashlib.sha1(prompt.encode()).hexdigest()[:12])
+            if item_id in seen:
+                print(f"⚠️ Line {line_no}: duplicate id '{item_id}', skipped.")
+                continue
+            seen.add(item_id)
+            items.append((item_id, prompt))
+    return items
+
+class Manifest:
+    """Per-prompt status file. Only the parent process writes it (atomic replace)."""
+    def __init__(self, path: str, source: str):
+        self.path = path
+        self.data = {"source": os.path.abspath(source), "items": {}}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.data = json.load(f)
+
+    @property
+    def items(self) -> dict:
+        return self.data["items"]
+
+    def sync(self, prompts: List[Tuple[str, str]]):
+        """Adds new prompts; items left 'queued' by a crashed run go back to pending."""
+        for item_id, prompt in prompts:
+            item = self.items.setdefault(item_id, {"prompt": prompt, "status": "pending", "attempts": 0})
+            item["prompt"] = prompt
+            if item["status"] == "queued":
+                item["status"] = "pending"
+        self.save()
+
+    def todo(self, prompts: List[Tuple[str, str]], max_attempts: int) -> List[Tuple[str, str]]:
+        """Prompts still to run: not done and not out of attempts (call after sync)."""
+        return [(item_id, prompt) for item_id, prompt in prompts
+                if self.items[item_id]["status"] != "done"
+                and self.items[item_id]["attempts"] < max_attempts]
+
+    def update(self, item_id: str, **fields):
+        self.items[item_id].update(fields)
+        self.save()
+
+    def save(self):
+        atomic_write_json(self.path, self.data, indent=2)
+
+    def counts(self) -> dict:
+        counts = {}
+        for item in self.items.values():
+            counts[item["status"]] = counts.get(item["status"], 0) + 1
+        return counts
+
+def _init_worker(workers: int, log_dir: str):
+    """Builds one orchestrator per worker process and splits the Gemini quota between workers."""
+    global _orchestrator, _log_dir
+    for var, default in (("GEMINI_RPM", "10"), ("GEMINI_TPM", "250000")):
+        os.environ[var] = str(float(os.getenv(var, default)) / workers)
+    from orchestrator import VideoOrchestrator
+    _orchestrator = VideoOrchestrator()
+    _log_dir = log_dir
+
+def _run_prompt(item_id: str, prompt: str, session_id: str) -> dict:
+    """Runs in a worker. Output goes to a per-item log so parallel runs stay readable."""
+    os.makedirs(_log_dir, exist_ok=True)
+    log_path = os.path.join(_log_dir, f"{item_id}.log")
+    start = time.perf_counter()
+    with open(log_path, "a") as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        print(f"=== {datetime.now().isoformat()} session {session_id}")
+        record = _orchestrator.create_video(prompt, session_id=session_id)
+    return {
+        "video_id": record["id"],
+        "cloudinary_url": record.get("cloudinary_url"),
+        "seconds": round(time.perf_counter() - start, 1),
+        "stages": {k: round(v, 2) for k, v in _orchestrator.stage_timings.items()},
+        "log": log_path,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate many videos from a JSONL prompt file.")
+    parser.add_argument("prompts", help="JSONL file with one prompt per line.")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Parallel worker processes (default: half the CPUs).")
+    parser.add_argument("--manifest", default=None,
+                        help="Status manifest (default: data/batch/<prompt file name>.manifest.json).")
+    parser.add_argument("--prompt-field", default=None, help="JSON field holding the prompt text.")
+    parser.add_argument("--max-attempts", type=int, default=3,
+                        help="Failed prompts are retried on later runs up to this many attempts.")
+    parser.add_argument("--log-dir", default=os.path.join(BASE_DIR, "data", "batch", "logs"))
+    args = parser.parse_args()
+
+    name = os.path.splitext(os.path.basename(args.prompts))[0]
+    manifest_path = args.manifest or os.path.join(BASE_DIR, "data", "batch", f"{name}.manifest.json")
+    manifest = Manifest(manifest_path, args.prompts)
+    prompts = load_prompts(args.prompts, args.prompt_field)
+    manifest.sync(prompts)
+
+    todo = manifest.todo(prompts, args.max_attempts)
+    skipped = len(prompts) - len(todo)
+    print(f"📦 Batch: {len(prompts)} prompts, {skipped} already done/exhausted, {len(todo)} to run "
+          f"on {args.workers} workers.")
+    print(f"   Manifest: {manifest_path}")
+    if not todo:
+        return
+
+    from orchestrator import slugify
+    # spawn: workers must not inherit gRPC/HTTP client state from the parent
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=args.workers, mp_context=context,
+            initializer=_init_worker, initargs=(args.workers, args.log_dir)) as pool:
+        futures = {}
+        for item_id, prompt in todo:
+            session_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{slugify(item_id)}"
+            item = manifest.items[item_id]
+            manifest.update(item_id, status="queued", attempts=item["attempts"] + 1,
+                            queued_at=datetime.now().isoformat(), error=None)
+            futures[pool.submit(_run_prompt, item_id, prompt, session_id)] = item_id
+
+        for future in concurrent.futures.as_completed(futures):
+            item_id = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                manifest.update(item_id, status="failed", error=f"{type(e).__name__}: {e}",
+                                finished_at=datetime.now().isoformat())
+                print(f"   ❌ {item_id}: {e}")
+            else:
+                manifest.update(item_id, status="done", result=result, finished_at=datetime.now().isoformat())
+                print(f"   ✅ {item_id}: {result['cloudinary_url'] or result['video_id']} ({result['seconds']}s)")
+
+    counts = manifest.counts()
+    print(f"✨ Batch finished: {counts}")
+    if counts.get("failed"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+Offline benchmark suite for the whole pipeline.
+
+Every external dependency is replaced by a deterministic local fake
+(see benchmark_fakes.py), so numbers are comparable between runs:
+
+    python benchmark.py                                  # full matrix
+    python benchmark.py --scenes 5 --resolutions 640x360 # quick run
+    python benchmark.py --compare data/benchmarks/bench_old.json
+
+Results are written as JSON (default: data/benchmarks/bench_<timestamp>.json).
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import List, Tuple
+
+from moviepy import AudioFileClip
+
+from asset_store import AssetStore
+from benchmark_fakes import (
+    FakeAudioGenerator, FakeMediaFetcher, FakeUploader, FakeUploadServer, MediaServer,
+    fake_director, make_timeline, prepare_media,
+)
+from library_manager import LibraryManager
+from orchestrator import VideoOrchestrator
+from query_index import QueryIndex
+from rate_limiter import RateLimiter, set_gemini_limiter
+from video_editor import OUTPUT_PRESETS, VideoAssembler
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+FPS = 24
+
+def parse_resolution(text: str) -> Tuple[int, int]:
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+def res_label(res: Tuple[int, int]) -> str:
+    return f"{res[0]}x{res[1]}"
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return "unknown"
+
+def bench_pipeline(work_dir: str, server: MediaServer, media: dict, scenes: int,
+                   resolution: Tuple[int, int], words_per_scene: int, upload_server=None,
+                   backend: str = "moviepy") -> dict:
+    """
+    Runs VideoOrchestrator.create_video end to end against the fakes.
+    With an upload_server (FakeUploadServer) the video is streamed up while it is encoded.
+    """
+    run_dir = os.path.join(work_dir, f"pipeline_{scenes}")
+    shutil.rmtree(run_dir, ignore_errors=True)
+    source = media[resolution]
+
+    audio_gen = FakeAudioGenerator()
+    orch = VideoOrchestrator(
+        director=fake_director(scenes, words_per_scene),
+        fetcher=FakeMediaFetcher(server, source["clip"], source["thumbs"],
+                                 AssetStore(os.path.join(run_dir, "data", "assets")),
+                                 QueryIndex(os.path.join(run_dir, "library.json"))),
+        audio_gen=audio_gen,
+        editor=VideoAssembler(),
+        cloudinary=FakeUploader(upload_server.url("upload") if upload_server else None),
+        library=LibraryManager(os.path.join(run_dir, "library.json")),
+        base_dir=run_dir,
+        upload_mode="stream" if upload_server else "file",
+    )
+    streamed_before = upload_server.received_bytes if upload_server else 0
+    served_before = server.bytes_sent
+
+    start = time.perf_counter()
+    orch.create_video(f"Benchmark video with {scenes} scenes", render_backend=backend)
+    total = time.perf_counter() - start
+
+    return {
+        "scenes": scenes,
+        "source_resolution": res_label(resolution),
+        "backend": backend,
+        "total_seconds": round(total, 3),
+        "stages": {k: round(v, 3) for k, v in orch.stage_timings.items()},
+        "tts_requests": audio_gen.requests,
+        "downloaded_bytes": server.bytes_sent - served_before,
+        "uploaded_bytes": orch.cloudinary.uploaded_bytes,
+        "streamed_bytes": (upload_server.received_bytes - streamed_before) if upload_server else 0,
+        "render_stats": orch.editor.last_render_stats,
+    }
+
+def bench_render(work_dir: str, media: dict, scenes: int, resolution: Tuple[int, int],
+                 words_per_scene: int, assembly_mode: str = "auto", backend: str = "moviepy") -> dict:
+    """Times VideoAssembler alone on a prepared timeline and reports render fps."""
+    run_dir = os.path.join(work_dir, f"render_{backend}_{scenes}_{res_label(resolution)}")
+    shutil.rmtree(run_dir, ignore_errors=True)
+    os.makedirs(run_dir)
+
+    timeline = make_timeline(scenes, words_per_scene)
+    audio_gen = FakeAudioGenerator()
+    audio_data = [audio_gen.generate_narrative(scene["script"], os.path.join(run_dir, f"audio_{i}.mp3"))
+                  for i, scene in enumerate(timeline)]
+    media_paths = [media[resolution]["path"]] * scenes
+
+    video_seconds = 0.0
+    for audio_path, _ in audio_data:
+        clip = AudioFileClip(audio_path)
+        video_seconds += clip.duration
+        clip.close()
+
+    editor = VideoAssembler()
+    editor.assembly_mode = assembly_mode
+    output_path = os.path.join(run_dir, "final.mp4")
+    start = time.perf_counter()
+    editor.assemble_video_from_timeline(timeline, media_paths, audio_data, output_path, backend=backend)
+    seconds = time.perf_counter() - start
+
+    frames = int(round(video_seconds * FPS))
+    result = {
+        "scenes": scenes,
+        "source_resolution": res_label(resolution),
+        "backend": backend,
+        "video_seconds": round(video_seconds, 3),
+        "frames": frames,
+        "seconds": round(seconds, 3),
+        "fps": round(frames / seconds, 3) if seconds else None,
+        "output_bytes": os.path.getsize(output_path),
+        **editor.last_render_stats,
+    }
+    shutil.rmtree(run_dir, ignore_errors=True)
+    return result
+
+def cpu_seconds() -> float:
+    """User + system CPU of this process and its finished children (the ffmpeg encoders/readers)."""
+    own, children = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+def bench_multi_format(work_dir: str, media: dict, scenes: int, resolution: Tuple[int, int],
+                       words_per_scene: int, formats: List[str], backend: str = "moviepy") -> dict:
+    """
+    CPU and wall time of one assemble_multi_format call against rendering each
+    format separately (one decode per format), on the same timeline.
+    """
+    run_dir = os.path.join(work_dir, f"multi_{backend}_{scenes}_{res_label(resolution)}")
+    shutil.rmtree(run_dir, ignore_errors=True)
+    os.makedirs(run_dir)
+
+    timeline = make_timeline(scenes, words_per_scene)
+    audio_gen = FakeAudioGenerator()
+    audio_data = [audio_gen.generate_narrative(scene["script"], os.path.join(run_dir, f"audio_{i}.mp3"))
+                  for i, scene in enumerate(timeline)]
+    media_paths = [media[resolution]["path"]] * scenes
+
+    separate = {}
+    for name in formats:
+        editor = VideoAssembler()
+        editor.output_targets = {name: OUTPUT_PRESETS[name]}
+        editor.target_resolution = OUTPUT_PRESETS[name]
+        cpu, start = cpu_seconds(), time.perf_counter()
+        editor.assemble_video_from_timeline(timeline, media_paths, audio_data,
+                                            os.path.join(run_dir, f"single_{name}.mp4"), backend=backend)
+        separate[name] = {"seconds": round(time.perf_counter() - start, 3), "cpu_seconds": round(cpu_seconds() - cpu, 3)}
+
+    editor = VideoAssembler()
+    editor.output_targets = {name: OUTPUT_PRESETS[name] for name in formats}
+    output_paths = {name: os.path.join(run_dir, f"multi_{name}.mp4") for name in formats}
+    cpu, start = cpu_seconds(), time.perf_counter()
+    editor.assemble_multi_format(timeline, media_paths, audio_data, output_paths, backend=backend)
+    multi = {"seconds": round(time.perf_counter() - start, 3), "cpu_seconds": round(cpu_seconds() - cpu, 3)}
+
+    separate_cpu = sum(r["cpu_seconds"] for r in separate.values())
+    result = {
+        "scenes": scenes,
+        "source_resolution": res_label(resolution),
+        "backend": backend,
+        "formats": formats,
+        "separate": separate,
+        "multi": multi,
+        # 1.0 would mean rendering every format costs what the first one alone does
+        "cpu_vs_first_format": round(multi["cpu_seconds"] / separate[formats[0]]["cpu_seconds"], 3),
+        "cpu_vs_separate": round(multi["cpu_seconds"] / separate_cpu, 3),
+        "peak_rss_mb": editor.last_render_stats.get("peak_rss_mb"),
+    }
+    shutil.rmtree(run_dir, ignore_errors=True)
+    return result
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Compares two result files. Returns a list of human-readable regressions
+    (metrics worse than baseline by more than `tolerance`, as a fraction).
+    """
+    regressions = []
+
+    def key(row):
+        return (row["scenes"], row["source_resolution"])
+
+    def render_key(row):
+        return key(row) + (row.get("backend", "moviepy"),)
+
+    base_render = {render_key(r): r for r in baseline.get("render", [])}
+    for row in current.get("render", []):
+        old = base_render.get(render_key(row))
+        if not old or not old.get("fps") or not row.get("fps"):
+            continue
+        change = row["fps"] / old["fps"] - 1
+        print(f"   render {render_key(row)}: {old['fps']:.2f} -> {row['fps']:.2f} fps ({change:+.1%})")
+        if change < -tolerance:
+            regressions.append(f"render {render_key(row)} fps {change:+.1%}")
+
+    base_pipeline = {key(r): r for r in baseline.get("pipeline", [])}
+    for row in current.get("pipeline", []):
+        old = base_pipeline.get(key(row))
+        if not old:
+            continue
+        for stage, seconds in row["stages"].items():
+            old_seconds = old["stages"].get(stage)
+            if not old_seconds:
+                continue
+            change = seconds / old_seconds - 1
+            print(f"   pipeline {key(row)} {stage}: {old_seconds:.2f}s -> {seconds:.2f}s ({change:+.1%})")
+            # Sub-100ms stages are dominated by noise
+            if change > tolerance and seconds - old_seconds > 0.1:
+                regressions.append(f"pipeline {key(row)} {stage} {change:+.1%}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the video pipeline.")
+    parser.add_argument("--scenes", type=int, nargs="+", default=[5, 15, 40])
+    parser.add_argument("--resolutions", nargs="+", default=["640x360", "1280x720", "1920x1080"],
+                        help="Source clip resolutions for the render benchmark (WxH).")
+    parser.add_argument("--pipeline-resolution", default="1280x720",
+                        help="Source clip resolution used for end-to-end pipeline runs.")
+    parser.add_argument("--words-per-scene", type=int, default=12)
+    parser.add_argument("--assembly-mode", default="auto", choices=["auto", "classic", "streaming"],
+                        help="VideoAssembler mode for the render benchmark.")
+    parser.add_argument("--backends", nargs="+", default=["moviepy"], choices=["moviepy", "ffmpeg"],
+                        help="Render backends to benchmark (the first one is used for pipeline runs).")
+    parser.add_argument("--no-ranges", action="store_true",
+                        help="Stock media server ignores Range headers (exercises the full-download fallback).")
+    parser.add_argument("--upload-mode", default="file", choices=["file", "stream"],
+                        help="Pipeline upload mode; 'stream' uploads to a local chunked-upload stand-in.")
+    parser.add_argument("--upload-fail-after", type=int, default=None, metavar="N",
+                        help="With --upload-mode stream, the upload stand-in fails every request after the Nth "
+                             "(exercises the fall back to uploading the finished file).")
+    parser.add_argument("--formats", nargs="+", default=[], choices=list(OUTPUT_PRESETS),
+                        help="Also compare one multi-format render of these formats against separate renders.")
+    parser.add_argument("--skip-pipeline", action="store_true")
+    parser.add_argument("--skip-render", action="store_true")
+    parser.add_argument("--work-dir", default=os.path.join(BASE_DIR, "data", "benchmarks", "work"))
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None, help="Baseline result JSON to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed relative slowdown before a metric counts as a regression.")
+    args = parser.parse_args()
+
+    # Fakes answer instantly; measure our code, not the quota
+    set_gemini_limiter(RateLimiter(rpm=1e6, tpm=1e9))
+
+    resolutions = [parse_resolution(r) for r in args.resolutions]
+    pipeline_res = parse_resolution(args.pipeline_resolution)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output = args.output or os.path.join(BASE_DIR, "data", "benchmarks", f"bench_{timestamp}.json")
+
+    print("🧪 Benchmark: generating synthetic media...")
+    media_dir = os.path.join(args.work_dir, "media_src")
+    media = prepare_media(media_dir, sorted(set(resolutions + [pipeline_res])))
+
+    results = {
+        "meta": {
+            "timestamp": timestamp,
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "fps": FPS,
+            "words_per_scene": args.words_per_scene,
+            "assembly_mode": args.assembly_mode,
+            "backends": args.backends,
+            "formats": args.formats,
+            "upload_mode": args.upload_mode,
+            "upload_fail_after": args.upload_fail_after,
+            "media_ingest": os.getenv("MEDIA_INGEST", "range"),
+            "server_ranges": not args.no_ranges,
+        },
+        "pipeline": [],
+        "render": [],
+        "multi_format": [],
+    }
+
+    if not args.skip_pipeline:
+        upload_server = None
+        if args.upload_mode == "stream":
+            upload_server = FakeUploadServer(os.path.join(args.work_dir, "uploads"),
+                                             fail_after=args.upload_fail_after).start()
+        with MediaServer(media_dir, ranges=not args.no_ranges) as server:
+            for scenes in args.scenes:
+                print(f"🧪 Pipeline: {scenes} scenes @ {res_label(pipeline_res)}")
+                row = bench_pipeline(args.work_dir, server, media, scenes, pipeline_res, args.words_per_scene,
+                                     upload_server, args.backends[0])
+                print(f"   total {row['total_seconds']:.2f}s  stages {row['stages']}")
+                results["pipeline"].append(row)
+        if upload_server:
+            upload_server.stop()
+
+    if not args.skip_render:
+        for scenes in args.scenes:
+            for res in resolutions:
+                fps = {}
+                for backend in args.backends:
+                    print(f"🧪 Render ({backend}): {scenes} scenes @ {res_label(res)}")
+                    row = bench_render(args.work_dir, media, scenes, res, args.words_per_scene,
+                                       args.assembly_mode, backend)
+                    print(f"   {row['frames']} frames in {row['seconds']:.2f}s = {row['fps']:.2f} fps "
+                          f"(peak RSS {row.get('peak_rss_mb')} MB, {row.get('peak_fds')} fds)")
+                    results["render"].append(row)
+                    fps[backend] = row["fps"]
+                if fps.get("moviepy") and fps.get("ffmpeg"):
+                    print(f"   ⚡ ffmpeg backend speedup: {fps['ffmpeg'] / fps['moviepy']:.1f}x")
+
+    if args.formats:
+        for scenes in args.scenes:
+            for res in resolutions:
+                for backend in args.backends:
+                    print(f"🧪 Multi-format ({backend}): {scenes} scenes @ {res_label(res)} -> {', '.join(args.formats)}")
+                    row = bench_multi_format(args.work_dir, media, scenes, res, args.words_per_scene,
+                                             args.formats, backend)
+                    print(f"   CPU {row['multi']['cpu_seconds']:.1f}s for all vs "
+                          f"{sum(r['cpu_seconds'] for r in row['separate'].values()):.1f}s separately "
+                          f"({row['cpu_vs_separate']:.2f}x); {row['cpu_vs_first_format']:.2f}x one format")
+                    results["multi_format"].append(row)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"📊 Comparing against {args.compare}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("❌ Regressions:")
+            for r in regressions:
+                print(f"   - {r}")
+            sys.exit(1)
+        print("✅ No regressions.")
+
+if __name__ == "__main__":
+    main()
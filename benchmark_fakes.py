@@ -0,0 +1,377 @@
+"""
+Deterministic local stand-ins for every external service the pipeline talks to
+(Gemini, Pexels/DDG, edge-tts, Cloudinary). Used by benchmark.py so runs are
+reproducible and never touch the network or spend quota.
+"""
+import functools
+import json
+import os
+import random
+import re
+import socket
+import string
+import threading
+from email import policy
+from email.parser import BytesParser
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Dict, List, Tuple
+
+from PIL import Image, ImageDraw
+
+from agent import VideoDirector
+from audio_generator import AudioGenerator
+from candidate_ranker import CandidateRanker
+from cloudinary_manager import CloudinaryManager
+from ffmpeg_tools import run_ffmpeg
+from media_fetcher import MediaFetcher
+from orchestrator import slugify
+from phash_index import PerceptualIndex
+from query_index import QueryIndex
+
+BREEDS = ["Golden Retriever", "Belgian Malinois", "Border Collie", "Pug", "Husky", "Beagle"]
+SHOTS = ["close-up face", "wide shot running", "low angle looking up", "side profile walking", "jumping action shot"]
+WORDS = ["dogs", "always", "know", "when", "you", "are", "happy", "because", "they", "read",
+         "your", "face", "every", "single", "day", "and", "that", "is", "pure", "science"]
+
+def make_timeline(scene_count: int, words_per_scene: int = 12) -> List[dict]:
+    """Builds a canned timeline shaped exactly like the director's JSON output."""
+    timeline = []
+    for i in range(scene_count):
+        breed = BREEDS[i % len(BREEDS)]
+        shot = SHOTS[(i // len(BREEDS)) % len(SHOTS)]
+        words = [WORDS[(i + j) % len(WORDS)] for j in range(words_per_scene)]
+        timeline.append({
+            "visual_query": f"{breed} {shot} dog {i}",
+            "text_overlay": f"FACT {i + 1}",
+            "script": " ".join(words).capitalize() + ".",
+            "duration": 3,
+        })
+    return timeline
+
+class FakeChatModel:
+    """
+    Stands in for ChatGoogleGenerativeAI.
+    Text-only prompts get a canned timeline, prompts with an image get 'YES'.
+    """
+    def __init__(self, scene_count: int = 5, words_per_scene: int = 12):
+        self.scene_count = scene_count
+        self.words_per_scene = words_per_scene
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        for msg in messages:
+            if isinstance(msg.content, list) and any(
+                    part.get("type") == "image_url" for part in msg.content if isinstance(part, dict)):
+                return SimpleNamespace(content="YES")
+        timeline = make_timeline(self.scene_count, self.words_per_scene)
+        return SimpleNamespace(content="```json\n" + json.dumps(timeline) + "\n```")
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+class _RangeHandler(_QuietHandler):
+    """Static files with single-range support (bytes=start-end), counting bytes sent."""
+    def setup(self):
+        # Small send buffer: bytes_sent then tracks what the client actually read,
+        # instead of megabytes queued on loopback for connections it abandons
+        self.request.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 64 * 1024)
+        super().setup()
+
+    def _write(self, data: bytes):
+        self.wfile.write(data)
+        with self.server.lock:
+            self.server.bytes_sent += len(data)
+
+    def copyfile(self, source, outputfile):
+        try:
+            for chunk in iter(lambda: source.read(64 * 1024), b""):
+                self._write(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # e.g. a range probe that got the whole file and hung up
+
+    def end_headers(self):
+        if self.server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        super().end_headers()
+
+    def do_GET(self):
+        match = re.match(r"bytes=(\d*)-(\d*)$", self.headers.get("Range", ""))
+        path = self.translate_path(self.path)
+        if not self.server.ranges or not match or not os.path.isfile(path):
+            return super().do_GET()
+        size = os.path.getsize(path)
+        first, last = match.groups()
+        if first:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        else:
+            start, end = max(0, size - int(last or 0)), size - 1
+        if start >= size or start > end:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.end_headers()
+            return
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            try:
+                while remaining:
+                    chunk = f.read(min(64 * 1024, remaining))
+                    self._write(chunk)
+                    remaining -= len(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # ffmpeg hangs up once it has the seconds it needs
+
+class MediaServer:
+    """
+    Serves a local directory over HTTP on 127.0.0.1 from a background thread.
+    ranges=False ignores Range headers (always 200 + whole file), like some CDNs.
+    """
+    handler_class = _RangeHandler
+
+    def __init__(self, root: str, ranges: bool = True):
+        self.root = root
+        self.ranges = ranges
+        self.httpd = None
+        self.thread = None
+
+    def start(self):
+        handler = functools.partial(self.handler_class, directory=self.root)
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.ranges = self.ranges
+        self.httpd.lock = threading.Lock()
+        self.httpd.bytes_sent = 0
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    @property
+    def bytes_sent(self) -> int:
+        return self.httpd.bytes_sent
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def url(self, name: str) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/{name}"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+class _UploadHandler(_RangeHandler):
+    """Accepts Cloudinary-style chunked uploads (X-Unique-Upload-Id + Content-Range)."""
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        head = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+        form = BytesParser(policy=policy.default).parsebytes(head + body)
+        fields = {part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+                  for part in form.iter_parts()}
+        start, end, total = re.match(r"bytes (\d+)-(\d+)/(-?\d+)", self.headers["Content-Range"]).groups()
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            if server.fail_after is not None and server.requests > server.fail_after:
+                return self._reply(500, {"error": "injected failure"})
+            data = server.uploads.setdefault(self.headers["X-Unique-Upload-Id"], bytearray())
+            if int(start) != len(data) or int(end) != len(data) + len(fields["file"]) - 1:
+                return self._reply(400, {"error": f"unexpected range {start}-{end}, have {len(data)}"})
+            data += fields["file"]
+            server.received_bytes += len(fields["file"])
+            if total == "-1":
+                return self._reply(200, {"done": False})
+            if int(total) != len(data):
+                return self._reply(400, {"error": f"total {total} != received {len(data)}"})
+        public_id = fields["public_id"].decode()
+        with open(os.path.join(server.root, f"{slugify(public_id)}.mp4"), "wb") as f:
+            f.write(data)
+        self._reply(200, {"secure_url": f"fake://dog_videos/{public_id}", "bytes": len(data)})
+
+    def _reply(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class FakeUploadServer(MediaServer):
+    """
+    Local stand-in for Cloudinary's chunked upload endpoint. Completed uploads are
+    written to root. fail_after=N answers every request after the Nth with HTTP 500.
+    """
+    handler_class = _UploadHandler
+
+    def __init__(self, root: str, fail_after: int = None):
+        super().__init__(root)
+        self.fail_after = fail_after
+
+    def start(self):
+        os.makedirs(self.root, exist_ok=True)
+        super().start()
+        self.httpd.root = self.root
+        self.httpd.uploads = {}
+        self.httpd.requests = 0
+        self.httpd.received_bytes = 0
+        self.httpd.fail_after = self.fail_after
+        return self
+
+    @property
+    def received_bytes(self) -> int:
+        return self.httpd.received_bytes
+
+def make_clip(path: str, size: Tuple[int, int], seconds: float = 8, fps: int = 24) -> str:
+    """Writes a synthetic H.264 test-pattern clip (moving content, so the encoder has real work)."""
+    if not os.path.exists(path):
+        w, h = size
+        run_ffmpeg([
+            "-f", "lavfi", "-i", f"testsrc2=size={w}x{h}:rate={fps}:duration={seconds}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", path,
+        ])
+    return path
+
+def make_thumbnail(path: str, size: Tuple[int, int] = (320, 180), seed: int = 0) -> str:
+    """
+    Writes a small synthetic JPEG thumbnail. Different seeds give structurally
+    different images, so they do not collide in the perceptual-hash index.
+    """
+    if not os.path.exists(path):
+        rng = random.Random(seed)
+        img = Image.new("RGB", size, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        draw = ImageDraw.Draw(img)
+        for _ in range(12):
+            x0, y0 = rng.randrange(size[0]), rng.randrange(size[1])
+            x1, y1 = x0 + rng.randrange(20, size[0] // 2), y0 + rng.randrange(20, size[1] // 2)
+            draw.rectangle([x0, y0, x1, y1], fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        img.save(path, "JPEG", quality=85)
+    return path
+
+def prepare_media(root: str, resolutions: List[Tuple[int, int]], seconds: float = 8,
+                  thumb_count: int = 64) -> Dict[Tuple[int, int], dict]:
+    """
+    Generates one clip per source resolution plus a pool of distinct thumbnails
+    (one per scene, so candidates are not deduplicated as the same shot).
+    """
+    os.makedirs(root, exist_ok=True)
+    thumbs = [os.path.basename(make_thumbnail(os.path.join(root, f"thumb_{i}.jpg"), seed=i))
+              for i in range(thumb_count)]
+    media = {}
+    for w, h in resolutions:
+        clip = make_clip(os.path.join(root, f"clip_{w}x{h}.mp4"), (w, h), seconds)
+        media[(w, h)] = {"clip": os.path.basename(clip), "thumbs": thumbs, "path": clip}
+    return media
+
+class FakeMediaFetcher(MediaFetcher):
+    """MediaFetcher whose providers all resolve to the local MediaServer."""
+    def __init__(self, server: MediaServer, clip_name: str, thumb_names: List[str], asset_store=None,
+                 query_index=None):
+        super().__init__(vision_model=FakeChatModel(), phash_index=PerceptualIndex(path=None),
+                         asset_store=asset_store, query_index=query_index or QueryIndex(library_path=None),
+                         ranker=CandidateRanker(log_path=None))
+        self.pixabay_key = None
+        self.server = server
+        self.clip_name = clip_name
+        self.thumb_names = thumb_names
+        self.query_thumbs = {}
+
+    def _search_pexels_videos(self, query: str) -> List[dict]:
+        # Each new query gets the next distinct thumbnail (deterministic per run)
+        thumb = self.query_thumbs.setdefault(
+            query, self.thumb_names[len(self.query_thumbs) % len(self.thumb_names)])
+        return [{
+            'id': f"bench_vid_{slugify(query)}",
+            'type': 'video',
+            'download_url': self.server.url(self.clip_name),
+            'image': self.server.url(thumb),
+            'source': 'pexels_video',
+        }]
+
+    def _search_ddg_images(self, query: str) -> List[dict]:
+        return []
+
+    def _search_pexels_images(self, query: str) -> List[dict]:
+        return []
+
+@functools.lru_cache(maxsize=64)
+def _tone_mp3(duration: float, frequency: int) -> bytes:
+    # Same container/codec/rate edge-tts produces: 24 kHz mono 48 kbit/s MP3
+    return run_ffmpeg([
+        "-f", "lavfi", "-i", f"sine=frequency={frequency}:sample_rate=24000:duration={duration:.3f}",
+        "-ac", "1", "-c:a", "libmp3lame", "-b:a", "48k", "-f", "mp3", "pipe:1",
+    ], capture=True)
+
+class FakeCommunicate:
+    """Mimics edge_tts.Communicate: tone audio plus evenly spaced WordBoundary events."""
+    def __init__(self, text: str, seconds_per_word: float = 0.3, frequency: int = 440):
+        self.text = text
+        self.seconds_per_word = seconds_per_word
+        self.frequency = frequency
+
+    async def stream(self):
+        words = [w.strip(string.punctuation) for w in self.text.split()]
+        words = [w for w in words if w]
+        duration = round(max(len(words), 1) * self.seconds_per_word + 0.2, 3)
+        data = _tone_mp3(duration, self.frequency)
+
+        chunk_size = max(1, len(data) // max(len(words), 1))
+        pos = 0
+        for i, word in enumerate(words):
+            yield {
+                "type": "WordBoundary",
+                "offset": int((0.1 + i * self.seconds_per_word) * 1e7),
+                "duration": int(self.seconds_per_word * 0.9 * 1e7),
+                "text": word,
+            }
+            yield {"type": "audio", "data": data[pos:pos + chunk_size]}
+            pos += chunk_size
+        if pos < len(data):
+            yield {"type": "audio", "data": data[pos:]}
+
+class FakeAudioGenerator(AudioGenerator):
+    """AudioGenerator backed by FakeCommunicate instead of the edge-tts service."""
+    def __init__(self, seconds_per_word: float = 0.3):
+        super().__init__()
+        self.seconds_per_word = seconds_per_word
+        self.requests = 0
+
+    def _communicate(self, text: str):
+        self.requests += 1
+        return FakeCommunicate(text, self.seconds_per_word)
+
+class FakeUploader(CloudinaryManager):
+    """
+    Reads the file like a real upload would, then returns a fake URL.
+    Streaming uploads go to upload_url (a FakeUploadServer) when one is given.
+    """
+    def __init__(self, upload_url: str = None):
+        self.enabled = True
+        self.upload_url = upload_url
+        self.uploaded_bytes = 0
+
+    def _upload_params(self, public_id: str) -> dict:
+        return {"public_id": public_id, "folder": "dog_videos"}
+
+    def start_stream(self, file_path: str, public_id: str):
+        return super().start_stream(file_path, public_id) if self.upload_url else None
+
+    def upload_video(self, file_path: str, public_id: str) -> str:
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                self.uploaded_bytes += len(chunk)
+        return f"fake://dog_videos/{public_id}"
+
+def fake_director(scene_count: int, words_per_scene: int = 12) -> VideoDirector:
+    return VideoDirector(llm=FakeChatModel(scene_count, words_per_scene))
@@ -0,0 +1,99 @@
+"""
+Metadata pre-ranking of media candidates, before any vision call.
+
+Providers already tell us a candidate's size, and for videos its length. Each
+candidate gets a score in [0, 1] from:
+- resolution: how much it must be upscaled to cover the output frame
+- orientation: how much of it survives the center crop to the output aspect
+- duration: clip length against the scene's narration (images count as static)
+- source: how reliable the provider's results usually are
+Candidates are verified best-first. Hopeless ones (score below CANDIDATE_MIN_SCORE,
+or needing more than MAX_UPSCALE) are dropped unless nothing else is left.
+Scores and verification outcomes are appended to data/candidate_scores.jsonl for tuning.
+"""
+import json
+import os
+import time
+from typing import List, Optional, Tuple
+
+SOURCE_RELIABILITY = {"pexels_video": 1.0, "pixabay": 0.9, "pexels_image": 0.8, "ddg": 0.6}
+WEIGHTS = {"resolution": 0.3, "orientation": 0.3, "duration": 0.2, "source": 0.2}
+UNKNOWN = 0.7     # component score when the provider gave no metadata
+STATIC_IMAGE = 0.6  # duration score of a still image (no motion, but never too short)
+MAX_UPSCALE = 3.0
+
+class CandidateRanker:
+    def __init__(self, target_resolution: Tuple[int, int] = (1080, 1920),
+                 log_path: Optional[str] = "data/candidate_scores.jsonl", min_score: Optional[float] = None):
+        self.target_resolution = target_resolution
+        self.log_path = log_path
+        self.min_score = min_score if min_score is not None else float(os.getenv("CANDIDATE_MIN_SCORE", "0.35"))
+
+    def score(self, cand: dict, scene_duration: Optional[float] = None) -> Tuple[float, dict, Optional[str]]:
+        """Returns (score, component scores, reason it is hopeless or None)."""
+        tw, th = self.target_resolution
+        w, h = cand.get('width'), cand.get('height')
+        parts = {}
+        hopeless = None
+        if w and h:
+            upscale = max(tw / w, th / h)
+            parts["resolution"] = min(1.0, 1 / upscale)
+            # Fraction of the source that survives the center crop
+            parts["orientation"] = min((w / h) / (tw / th), (tw / th) / (w / h))
+            if upscale > MAX_UPSCALE:
+                hopeless = f"needs {upscale:.1f}x upscale"
+        else:
+            parts["resolution"] = parts["orientation"] = UNKNOWN
+
+        if cand.get('type') != 'video':
+            parts["duration"] = STATIC_IMAGE
+        elif cand.get('duration') and scene_duration:
+            # Shorter clips are looped, which reads as a glitch the shorter they are
+            parts["duration"] = min(1.0, cand['duration'] / scene_duration)
+        else:
+            parts["duration"] = UNKNOWN
+
+        parts["source"] = SOURCE_RELIABILITY.get(cand.get('source'), UNKNOWN)
+        total = sum(WEIGHTS[k] * v for k, v in parts.items())
+        if hopeless is None and total < self.min_score:
+            hopeless = f"score {total:.2f} < {self.min_score}"
+        return round(total, 4), {k: round(v, 3) for k, v in parts.items()}, hopeless
+
+    def rank(self, candidates: List[dict], query: str, scene_duration: Optional[float] = None):
+        """
+        Returns (candidates to verify, best first; score rows for record()).
+        Ties keep provider order.
+        """
+        rows = []
+        for cand in candidates:
+            total, parts, hopeless = self.score(cand, scene_duration)
+            rows.append({
+                "query": query, "scene_duration": scene_duration, "id": cand['id'],
+                "source": cand.get('source'), "type": cand.get('type'),
+                "width": cand.get('width'), "height": cand.get('height'), "duration": cand.get('duration'),
+                "score": total, "parts": parts, "dropped": hopeless, "outcome": None,
+            })
+        order = sorted(range(len(candidates)), key=lambda i: -rows[i]["score"])
+        kept = [i for i in order if not rows[i]["dropped"]]
+        if not kept and order:
+            # A weak shot still beats a black frame
+            kept = order[:1]
+            rows[kept[0]]["dropped"] = None
+        for i in order:
+            if rows[i]["dropped"]:
+                rows[i]["outcome"] = "dropped"
+        if len(kept) < len(candidates):
+            print(f"      📐 Pre-ranking dropped {len(candidates) - len(kept)} of {len(candidates)} candidates.")
+        return [candidates[i] for i in kept], rows
+
+    def record(self, rows: List[dict], outcomes: dict):
+        """Appends one JSON line per candidate with its score and what verification made of it."""
+        if not self.log_path or not rows:
+            return
+        ts = int(time.time())
+        os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+        with open(self.log_path, "a") as f:
+            for rank, row in enumerate(sorted(rows, key=lambda r: -r["score"])):
+                row = dict(row, ts=ts, rank=rank)
+                row["outcome"] = outcomes.get(row["id"], row["outcome"])
+                f.write(json.dumps(row) + "\n")
@@ -1,8 +1,12 @@
 import cloudinary
 import cloudinary.uploader
+import cloudinary.utils
 import os
+import time
 from dotenv import load_dotenv
 
+from stream_upload import StreamingUpload
+
 load_dotenv()
 
 class CloudinaryManager:
@@ -22,6 +26,9 @@ class CloudinaryManager:
             )
             self.enabled = True
 
+        # Chunked-upload endpoint for streaming uploads (override to test against a local stand-in)
+        self.upload_url = os.getenv("CLOUDINARY_UPLOAD_URL")
+
     def upload_video(self, file_path: str, public_id: str) -> str:
         """
         Uploads a video to Cloudinary and returns the secure URL.
@@ -43,3 +50,18 @@ class CloudinaryManager:
         except Exception as e:
             print(f"   ❌ Cloudinary Upload Error: {e}")
             return None
+
+    def _upload_params(self, public_id: str) -> dict:
+        params = {"public_id": public_id, "folder": "dog_videos", "timestamp": int(time.time())}
+        return cloudinary.utils.sign_request(params, {})
+
+    def start_stream(self, file_path: str, public_id: str):
+        """
+        Starts uploading file_path while it is still being written (fragmented MP4 only).
+        Returns a StreamingUpload to finish() after encoding, or None if uploads are disabled.
+        """
+        if not self.enabled:
+            return None
+        url = self.upload_url or cloudinary.utils.cloudinary_api_url("upload", resource_type="video")
+        print(f"   ☁️ Streaming upload to Cloudinary (ID: {public_id})...")
+        return StreamingUpload(file_path, url, self._upload_params(public_id)).start()
@@ -0,0 +1,173 @@
+"""
+Pure-ffmpeg render backend (RENDER_BACKEND=ffmpeg).
+
+The whole timeline becomes one ffmpeg filtergraph, so frames never pass through
+Python:
+- each scene's source is an input, looped (-stream_loop / -loop 1) and cut (-t) to
+  the narration length, then scaled and center-cropped like the MoviePy path
+- scenes are joined with the concat filter; narration is one prebuilt track
+- captions become an ASS script rendered by libass (subtitles filter) with the same
+  font, sizes, colours and outline as the TextClip captions
+Several output geometries share one decode: each source is split once per output.
+"""
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from PIL import ImageFont
+
+from ffmpeg_tools import run_ffmpeg
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+VIDEO_EXTENSIONS = ('.mp4', '.mov')
+
+def _ass_time(seconds: float) -> str:
+    cs = int(round(max(seconds, 0.0) * 100))
+    return f"{cs // 360000}:{cs // 6000 % 60:02d}:{cs // 100 % 60:02d}.{cs % 100:02d}"
+
+def _ass_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("{", "\\{").replace("}", "\\}").replace("\n", "\\N")
+
+def _filter_value(value: str) -> str:
+    """Escapes a filter option value for both levels of filtergraph parsing."""
+    for ch in "\\:'":
+        value = value.replace(ch, "\\" + ch)
+    for ch in "\\'[],;":
+        value = value.replace(ch, "\\" + ch)
+    return value
+
+class FFmpegRenderer:
+    def __init__(self, font_path: str, fps: int = 24, preset: str = "medium"):
+        self.font_path = font_path
+        self.fps = fps
+        self.preset = preset
+        font = ImageFont.truetype(font_path, 1000)
+        family, style = font.getname()
+        self.font_name = family
+        self.font_bold = "Bold" in style
+        # libass sizes fonts by ascent + descent; PIL/TextClip by the em square
+        ascent, descent = font.getmetrics()
+        self.ass_size_ratio = (ascent + descent) / 1000
+
+    def write_ass(self, path: str, timeline: list, subs_paths: list, starts: List[float],
+                  size: Tuple[int, int]):
+        """Word-by-word captions and per-scene titles for one output geometry, on the global timeline."""
+        w, h = size
+        scale = min(w, h) / 1080
+
+        def style(name, font_size, colour, outline, box_w, alignment, margin_v):
+            margin = max(0, (w - box_w) // 2)
+            return (f"Style: {name},{self.font_name},{round(font_size * scale * self.ass_size_ratio)},"
+                    f"{colour},{colour},&H00000000,&H00000000,{-1 if self.font_bold else 0},0,0,0,"
+                    f"100,100,0,0,1,{max(1, int(outline * scale))},0,{alignment},{margin},{margin},{margin_v},1")
+
+        lines = [
+            "[Script Info]",
+            "ScriptType: v4.00+",
+            f"PlayResX: {w}",
+            f"PlayResY: {h}",
+            "WrapStyle: 0",
+            "ScaledBorderAndShadow: yes",
+            "",
+            "[V4+ Styles]",
+            "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+            "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, "
+            "Shadow, Alignment, MarginL, MarginR, MarginV, Encoding",
+            # Same sizes/colours/boxes as VideoAssembler._caption_layers (ASS colours are &HAABBGGRR)
+            style("Word", 105, "&H0000FFFF", 5, min(int(1000 * scale), w - 80), 5, 0),
+            style("Title", 90, "&H00FFFFFF", 6, w - int(100 * scale), 8, int(200 * h / 1920)),
+            "",
+            "[Events]",
+            "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+        ]
+        for i, scene in enumerate(timeline):
+            start, end = starts[i], starts[i + 1]
+            subs_path = subs_paths[i]
+            if subs_path and os.path.exists(subs_path):
+                try:
+                    with open(subs_path, 'r') as f:
+                        for sub in json.load(f):
+                            word_end = sub['start'] + max(sub['end'] - sub['start'], 0.1)
+                            lines.append(f"Dialogue: 0,{_ass_time(start + sub['start'])},"
+                                         f"{_ass_time(min(start + word_end, end))},Word,,0,0,0,,"
+                                         f"{_ass_text(sub['word'].upper())}")
+                except Exception as e:
+                    print(f"   ⚠️ Subtitle JSON Error: {e}")
+            title = scene.get('text_overlay', "")
+            if title:
+                lines.append(f"Dialogue: 1,{_ass_time(start)},{_ass_time(end)},Title,,0,0,0,,"
+                             f"{_ass_text(title.upper())}")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+
+    def _input_args(self, media_path: Optional[str], duration: float, size: Tuple[int, int]) -> List[str]:
+        t = f"{duration:.3f}"
+        if media_path and os.path.exists(media_path):
+            if media_path.lower().endswith(IMAGE_EXTENSIONS):
+                return ["-loop", "1", "-framerate", str(self.fps), "-t", t, "-i", media_path]
+            if media_path.lower().endswith(VIDEO_EXTENSIONS):
+                # Loops sources shorter than the scene, like vfx.Loop in the MoviePy path
+                return ["-stream_loop", "-1", "-t", t, "-i", media_path]
+        return ["-f", "lavfi", "-t", t, "-i", f"color=c=black:s={size[0]}x{size[1]}:r={self.fps}"]
+
+    def render(self, timeline: list, media_paths: list, narration_path: str, subs_paths: list,
+               durations: List[float], outputs: Dict[str, Tuple[int, int]], work_dir: str,
+               ffmpeg_params: Optional[List[str]] = None):
+        """
+        outputs: {output path: (width, height)}. narration_path is the whole narration;
+        durations[i] is scene i's length in it.
+        Intermediate files (filtergraph, ASS) go to work_dir and are removed.
+        """
+        starts = [0.0]
+        for d in durations:
+            starts.append(starts[-1] + d)
+        sizes = list(outputs.values())
+        n_scenes, n_out = len(timeline), len(outputs)
+
+        base = os.path.join(work_dir, f"ffmpeg_render_{os.getpid()}")
+        temp_files = []
+        try:
+            args = []
+            for i in range(n_scenes):
+                args += self._input_args(media_paths[i], durations[i], sizes[0])
+
+            args += ["-i", narration_path]
+
+            graph = []
+            for i in range(n_scenes):
+                branch = f"[{i}:v]fps={self.fps},setpts=PTS-STARTPTS"
+                if n_out > 1:
+                    graph.append(f"{branch},split={n_out}" + "".join(f"[s{i}_{j}]" for j in range(n_out)))
+                else:
+                    graph.append(f"{branch}[s{i}_0]")
+                for j, (w, h) in enumerate(sizes):
+                    graph.append(f"[s{i}_{j}]scale={w}:{h}:force_original_aspect_ratio=increase,"
+                                 f"crop={w}:{h},setsar=1,format=yuv420p,"
+                                 f"trim=duration={durations[i]:.3f}[v{i}_{j}]")
+            for j, size in enumerate(sizes):
+                ass_path = f"{base}_{j}.ass"
+                self.write_ass(ass_path, timeline, subs_paths, starts, size)
+                temp_files.append(ass_path)
+                segments = "".join(f"[v{i}_{j}]" for i in range(n_scenes))
+                graph.append(f"{segments}concat=n={n_scenes}:v=1:a=0,"
+                             f"subtitles=filename={_filter_value(os.path.abspath(ass_path))}"
+                             f":fontsdir={_filter_value(os.path.dirname(self.font_path))}[out{j}]")
+
+            script_path = f"{base}_graph.txt"
+            with open(script_path, 'w') as f:
+                f.write(";\n".join(graph))
+            temp_files.append(script_path)
+            args += ["-filter_complex_script", script_path]
+
+            for j, path in enumerate(outputs):
+                args += ["-map", f"[out{j}]", "-map", f"{n_scenes}:a",
+                         "-c:v", "libx264", "-preset", self.preset, "-pix_fmt", "yuv420p", "-r", str(self.fps),
+                         "-c:a", "aac", "-b:a", "128k", *(ffmpeg_params or []), path]
+
+            print(f"   ⚡ ffmpeg render: {n_scenes} scenes, {starts[-1]:.1f}s -> "
+                  f"{', '.join(os.path.basename(p) for p in outputs)}")
+            run_ffmpeg(args)
+        finally:
+            for path in temp_files:
+                if os.path.exists(path):
+                    os.remove(path)
@@ -0,0 +1,27 @@
+import subprocess
+from typing import List
+
+def ffmpeg_exe() -> str:
+    """
+    Returns the ffmpeg binary MoviePy itself uses (bundled with imageio-ffmpeg),
+    so every subprocess call runs the same build as the render path.
+    """
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return "ffmpeg"
+
+def run_ffmpeg(args: List[str], capture: bool = False) -> bytes:
+    """
+    Runs ffmpeg with the given arguments (without the binary name).
+    Raises RuntimeError with the tail of stderr on failure.
+    Returns stdout when capture=True.
+    """
+    cmd = [ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-y", *args]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE if capture else subprocess.DEVNULL,
+                          stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        err = proc.stderr.decode(errors="replace").strip()[-500:]
+        raise RuntimeError(f"ffmpeg failed ({proc.returncode}): {err}")
+    return proc.stdout if capture else b""
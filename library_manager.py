@@ -1,11 +1,15 @@
 import json
 import os
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+from file_utils import atomic_write_json, file_lock
 
 class LibraryManager:
-    def __init__(self, library_path: str = "data/library.json"):
-        self.library_path = library_path
+    def __init__(self, library_path: Optional[str] = None):
+        # Default: the repo's data/library.json, whatever the working directory
+        self.library_path = library_path or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "data", "library.json")
         # Ensure file exists
         if not os.path.exists(self.library_path):
             os.makedirs(os.path.dirname(self.library_path), exist_ok=True)
@@ -17,11 +21,12 @@ class LibraryManager:
         Adds a video entry to the library.
         video_data should have: id, prompt, local_path, cloudinary_url, timestamp
         """
-        entries = self.get_all_videos()
-        entries.append(video_data)
-        
-        with open(self.library_path, 'w') as f:
-            json.dump(entries, f, indent=2)
+        # Batch workers share the file: lock the read-modify-write
+        with file_lock(self.library_path):
+            entries = self.get_all_videos()
+            entries.append(video_data)
+            
+            atomic_write_json(self.library_path, entries, indent=2)
             
     def get_all_videos(self) -> List[Dict]:
         """Returns all videos (newest first logic can be applied in frontend)"""
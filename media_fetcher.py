@@ -1,14 +1,28 @@
 import os
+import base64
+import hashlib
 import requests
-import random
 import time
+import math
 from typing import List, Optional
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage
 from ddgs import DDGS
+from rate_limiter import PRIORITY_VERIFY, estimate_tokens, gemini_limiter, is_rate_limit_error
+from phash_index import PerceptualIndex
+from asset_store import AssetStore
+from query_index import QueryIndex
+from candidate_ranker import CandidateRanker
+from ffmpeg_tools import run_ffmpeg
+
+# _verify_content results. Only the model's own YES/NO is remembered across videos.
+MATCH, NO_MATCH, UNKNOWN = "match", "no_match", "unknown"
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 
 class MediaFetcher:
-    def __init__(self):
+    def __init__(self, vision_model=None, limiter=None, phash_index=None, asset_store=None,
+                 query_index=None, ranker=None, data_dir: Optional[str] = None):
         self.pexels_key = os.getenv("PEXELS_API_KEY")
         self.pixabay_key = os.getenv("PIXABAY_API_KEY")
         self.google_key = os.getenv("GOOGLE_API_KEY")
@@ -19,7 +33,9 @@ class MediaFetcher:
         self.headers = {"Authorization": self.pexels_key} if self.pexels_key else {}
         
         # Vision Model for Verification
-        if self.google_key:
+        if vision_model is not None:
+            self.vision_model = vision_model
+        elif self.google_key:
             # User requested gemini-2.5-flash
             self.vision_model = ChatGoogleGenerativeAI(
                 model="gemini-2.5-flash", 
@@ -35,16 +51,67 @@ class MediaFetcher:
             print("⚠️ GOOGLE_API_KEY missing. Visual verification disabled.")
             self.vision_model = None
 
-    def download_media(self, search_terms: List[str], target_dir: str, max_items: int = 1) -> List[str]:
+        # Shared with VideoDirector; verification runs at lower priority
+        self.limiter = limiter or gemini_limiter()
+
+        # Default stores live under data_dir (the repo's data/ unless the orchestrator passes its own),
+        # never relative to the working directory
+        data_dir = data_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+        # Thumbnail hashes catch the same shot served by several providers
+        self.phash = phash_index or PerceptualIndex(os.path.join(data_dir, "phash_index.json"))
+        self.session_media_ids = set()
+
+        # Downloads are kept across sessions, keyed by provider id / URL and content hash
+        self.assets = asset_store or AssetStore(os.path.join(data_dir, "assets"))
+
+        # Media accepted for (nearly) the same query in past videos, from library history
+        self.query_index = query_index or QueryIndex(os.path.join(data_dir, "library.json"))
+        # Per search term of the last download_media call: what was picked (stored in the library)
+        self.last_selections = []
+
+        # Orders candidates by size/orientation/length before any vision call
+        self.ranker = ranker or CandidateRanker(log_path=os.path.join(data_dir, "candidate_scores.jsonl"))
+
+        # "range": fetch only the leading seconds a scene uses (HTTP ranges), "full": whole file
+        self.ingest_mode = os.getenv("MEDIA_INGEST", "range")
+
+    def begin_session(self, session_id: Optional[str] = None):
+        """Starts a new video: used ids/shots only dedupe within one session."""
+        self.session_media_ids = set()
+        self.phash.begin_session()
+        self.assets.begin_session(session_id or f"pid{os.getpid()}_{time.time():.0f}")
+        self.query_index.refresh()
+
+    def end_session(self):
+        """Releases this session's hold on stored assets (they stay cached)."""
+        self.assets.end_session()
+
+    def download_media(self, search_terms: List[str], target_dir: str, max_items: int = 1,
+                       durations: Optional[List[float]] = None) -> List[str]:
         """
         Smart download: Searches Pexels/Web, VERIFIES content with Gemini, then downloads.
-        Prevents duplicate media usage within the same session.
+        Prevents duplicate media usage within the same session (see begin_session),
+        including the same shot arriving from another provider (perceptual hash).
+        Queries answered in earlier videos are resolved from the library first (QueryIndex).
+        Candidates are verified in CandidateRanker order; hopeless ones are never verified.
+        durations (seconds per term, parallel to search_terms) lets videos be trimmed at ingest.
         """
         downloaded_files = []
-        seen_media_ids = set()  # Track used IDs to prevent duplicates
+        selections = []
+        seen_media_ids = self.session_media_ids  # Track used IDs to prevent duplicates
         os.makedirs(target_dir, exist_ok=True)
         
-        for term in search_terms:
+        for term_index, term in enumerate(search_terms):
+            duration = durations[term_index] if durations else None
+            # 0. Reuse what an earlier video accepted for the same query
+            reused = self._reuse_from_history(term, target_dir, duration)
+            if reused:
+                filepath, selection = reused
+                downloaded_files.append(filepath)
+                selections.append(selection)
+                continue
+
             print(f"   🔍 Searching for: '{term}'")
             
             # 1. Gather Candidates
@@ -63,12 +130,19 @@ class MediaFetcher:
             if len(candidates) < 5 and self.pixabay_key:
                  candidates.extend(self._search_pixabay_candidates(term))
             
-            # 2. Verify and Download
+            # 2. Rank by metadata: best fits are verified first, hopeless ones never
+            candidates, score_rows = self.ranker.rank(candidates, term, duration)
+            outcomes = {}  # candidate id -> what became of it (recorded with the scores)
+
+            # 3. Verify and Download
             found_match = False
+            fallback = None  # First near-duplicate, used only if nothing fresh matches
+            unverified = None  # First candidate the model gave no answer for (quota, block, error)
             for cand in candidates:
                 # Skip duplicates
                 if cand['id'] in seen_media_ids:
                     print(f"      ⏭️ Skipping duplicate candidate {cand['id']}...")
+                    outcomes[cand['id']] = "duplicate"
                     continue
                 
                 # Determine extension based on type
@@ -79,45 +153,157 @@ class MediaFetcher:
                 filepath = os.path.join(target_dir, filename)
                 if os.path.exists(filepath):
                     downloaded_files.append(filepath)
+                    selections.append(self._selection(cand, filepath, duration=duration))
                     seen_media_ids.add(cand['id'])  # Mark as used
+                    outcomes[cand['id']] = "selected"
                     found_match = True
                     break
 
+                # Perceptual dedupe (before any vision call or download)
+                thumb_hash, thumb_bytes, thumb_mime = self.phash.fetch(cand['image'])
+                verdict = None
+                if thumb_hash is not None:
+                    used_id = self.phash.used_match(thumb_hash)
+                    if used_id:
+                        print(f"      ⏭️ Skipping {cand['id']}: same shot as {used_id}.")
+                        fallback = fallback or (cand, filename, thumb_hash)
+                        outcomes[cand['id']] = "same_shot"
+                        continue
+                    verdict = self.phash.verdict(thumb_hash, term)
+                    if verdict == 'rejected':
+                        print(f"      ⏭️ Skipping {cand['id']}: previously rejected for this query.")
+                        outcomes[cand['id']] = "rejected"
+                        continue
+
                 # Verification
-                if self.vision_model:
+                confirmed = False
+                if self.vision_model and verdict != 'accepted':
                     print(f"      👁️ Verifying candidate {cand['id']} ({cand['type']})...")
                     # Use 'image' (thumbnail) for verification to save bandwidth/time
-                    if self._verify_content(cand['image'], term):
-                        print("      ✅ Match confirmed!")
-                        # Download using the download_url
-                        filepath = self._download_file(cand['download_url'], filename, target_dir)
-                        if filepath:
-                            downloaded_files.append(filepath)
-                            seen_media_ids.add(cand['id'])  # Mark as used
-                            found_match = True
-                            break
-                    else:
+                    image = cand['image']
+                    if thumb_bytes:
+                        # Reuse the bytes we already fetched for hashing
+                        image = f"data:{thumb_mime};base64,{base64.b64encode(thumb_bytes).decode()}"
+                    result = self._verify_content(image, term)
+                    if result == NO_MATCH:
                         print("      ❌ Rejected (irrelevant content).")
-                else:
-                    # No verification
-                    filepath = self._download_file(cand['download_url'], filename, target_dir)
-                    if filepath:
-                        downloaded_files.append(filepath)
-                        seen_media_ids.add(cand['id'])  # Mark as used
-                        found_match = True
-                        break
-            
+                        outcomes[cand['id']] = "rejected"
+                        if thumb_hash is not None:
+                            self.phash.mark_rejected(thumb_hash, cand['id'], term)
+                        continue
+                    if result == UNKNOWN:
+                        print("      ❔ Unverified; kept in case nothing else matches.")
+                        unverified = unverified or (cand, filename, thumb_hash)
+                        outcomes[cand['id']] = "unverified"
+                        continue
+                    print("      ✅ Match confirmed!")
+                    confirmed = True
+                elif verdict == 'accepted':
+                    print(f"      ✅ {cand['id']} previously accepted for this query.")
+
+                # Download using the download_url
+                filepath = self._download_file(cand['download_url'], filename, target_dir, key=cand['id'],
+                                               duration=duration)
+                if filepath:
+                    downloaded_files.append(filepath)
+                    selections.append(self._selection(cand, filepath, thumb_hash, duration))
+                    seen_media_ids.add(cand['id'])  # Mark as used
+                    if thumb_hash is not None:
+                        self.phash.mark_used(thumb_hash, cand['id'])
+                        if confirmed:
+                            self.phash.mark_accepted(thumb_hash, cand['id'], term)
+                    outcomes[cand['id']] = "selected"
+                    found_match = True
+                    break
+
+            # An unchecked shot, or repeating one, beats a black frame
+            for pick, label in ((unverified, "unverified"), (fallback, "near-duplicate")):
+                if found_match or not pick:
+                    continue
+                cand, filename, thumb_hash = pick
+                print(f"      ♻️ Using {label} {cand['id']} (no confirmed fresh match).")
+                filepath = self._download_file(cand['download_url'], filename, target_dir, key=cand['id'],
+                                               duration=duration)
+                if filepath:
+                    downloaded_files.append(filepath)
+                    selections.append(self._selection(cand, filepath, thumb_hash, duration))
+                    seen_media_ids.add(cand['id'])
+                    if thumb_hash is not None and pick is unverified:
+                        self.phash.mark_used(thumb_hash, cand['id'])
+                    outcomes[cand['id']] = "selected"
+                    found_match = True
+
+            self.ranker.record(score_rows, outcomes)
+
             if not found_match:
                  print(f"   ⚠️ No suitable media found for '{term}' after verification.")
                  downloaded_files.append(None) 
+                 selections.append(None)
 
+        self.phash.save()
+        self.last_selections = selections
         return downloaded_files
 
-    def _verify_content(self, image_url: str, query: str) -> bool:
+    def _selection(self, cand: dict, filepath: str, thumb_hash: Optional[int] = None,
+                   duration: Optional[float] = None) -> dict:
+        """What the library records for a scene's media, so later videos can reuse it."""
+        keys, trimmed_keys, _ = self._asset_keys(cand['download_url'], cand['id'], filepath, duration)
+        return {
+            'id': cand['id'],
+            'type': cand['type'],
+            'download_url': cand['download_url'],
+            'image': cand['image'],
+            'phash': f"{thumb_hash:016x}" if thumb_hash is not None else None,
+            'asset': self.assets.lookup(keys + trimmed_keys),
+        }
+
+    def _reuse_from_history(self, term: str, target_dir: str, duration: Optional[float] = None):
+        """
+        Resolves term from media accepted for a near-identical query in past videos,
+        skipping provider search (and, above the reuse threshold, vision).
+        Returns (filepath, selection) or None.
+        """
+        match = self.query_index.lookup(term, exclude_ids=self.session_media_ids)
+        if not match:
+            return None
+        cand, score = match
+        thumb_hash = int(cand['phash'], 16) if cand.get('phash') else None
+        if thumb_hash is not None:
+            used_id = self.phash.used_match(thumb_hash)
+            if used_id:
+                print(f"   🗂️ History pick {cand['id']} is the same shot as {used_id}; searching instead.")
+                return None
+        confirmed = False
+        if score < self.query_index.reuse_threshold and self.vision_model:
+            print(f"   🗂️ Similar past query ({score:.2f}); verifying {cand['id']}...")
+            if self._verify_content(cand['image'], term) != MATCH:
+                print("      ❌ Not confirmed for this query. Searching instead.")
+                return None
+            confirmed = True
+        else:
+            print(f"   🗂️ Reusing {cand['id']} from library history ({score:.2f} match).")
+
+        ext = ".mp4" if cand['type'] == 'video' else ".jpg"
+        filename = f"{term[:10].replace(' ', '_')}_{cand['id']}{ext}"
+        filepath = self._download_file(cand['download_url'], filename, target_dir, key=cand['id'],
+                                       duration=duration)
+        if not filepath:
+            return None
+        self.session_media_ids.add(cand['id'])
+        if thumb_hash is not None:
+            self.phash.mark_used(thumb_hash, cand['id'])
+            if confirmed:
+                self.phash.mark_accepted(thumb_hash, cand['id'], term)
+        return filepath, self._selection(cand, filepath, thumb_hash, duration)
+
+    def _verify_content(self, image_url: str, query: str) -> str:
         """
         Enhanced verification for creator-grade accuracy.
         Checks BOTH subject (breed) AND action matching.
-        Fail-Open on Rate Limit / Safety Blocks.
+        Returns MATCH / NO_MATCH for the model's answer, or UNKNOWN when there is
+        none (quota still exhausted after the limiter's retries, safety block,
+        other errors). Unknown candidates are only used if nothing matches and
+        are never remembered as accepted or rejected.
         """
         try:
             # Extract subject and action from query for precise verification
@@ -145,22 +331,25 @@ Answer: YES or NO"""
                     {"type": "image_url", "image_url": image_url},
                 ]
             )
-            response = self.vision_model.invoke([msg])
+            response = self.limiter.call(
+                lambda: self.vision_model.invoke([msg]),
+                tokens=estimate_tokens(prompt, images=1),
+                priority=PRIORITY_VERIFY,
+            )
             result = response.content.strip().upper()
             
             if not result:
-                print("      ⚠️ Verification Warning: Empty response (blocked). Defaulting to MATCH.")
-                return True
+                print("      ⚠️ Verification Warning: Empty response (blocked).")
+                return UNKNOWN
                 
-            return "YES" in result
+            return MATCH if "YES" in result else NO_MATCH
         except Exception as e:
-            err_str = str(e)
-            if "429" in err_str or "RESOURCE_EXHAUSTED" in err_str:
-                print(f"      ⚠️ Quota Exceeded for Verification. Defaulting to MATCH.")
-                return True
+            if is_rate_limit_error(e):
+                print(f"      ⚠️ Quota Exceeded for Verification.")
+                return UNKNOWN
             
             print(f"      Verify Error: {e}")
-            return True # Fail Open
+            return UNKNOWN
 
     def _search_ddg_images(self, query: str) -> List[dict]:
         """Scrapes DuckDuckGo for images (High Relevance)"""
@@ -180,11 +369,14 @@ Answer: YES or NO"""
                     thumb = res.get('thumbnail')
                     if img_url:
                         results.append({
-                            # Use a hash or random ID
-                            'id': f"ddg_{random.randint(10000,99999)}",
+                            # Stable id from the URL so repeats are recognised
+                            'id': f"ddg_{hashlib.md5(img_url.encode()).hexdigest()[:12]}",
                             'type': 'image',
                             'download_url': img_url,
-                            'image': thumb or img_url 
+                            'image': thumb or img_url,
+                            'source': 'ddg',
+                            'width': res.get('width'),
+                            'height': res.get('height'),
                         })
         except Exception as e:
             print(f"      DDG Error: {e}")
@@ -205,7 +397,11 @@ Answer: YES or NO"""
                             'id': f"pexels_vid_{v['id']}",  # Prefix with source
                             'type': 'video',
                             'download_url': files[0]['link'],
-                            'image': v['image'] 
+                            'image': v['image'],
+                            'source': 'pexels_video',
+                            'width': files[0]['width'],
+                            'height': files[0]['height'],
+                            'duration': v.get('duration'),
                         })
         except Exception: pass
         return results
@@ -220,11 +416,16 @@ Answer: YES or NO"""
                 data = resp.json()
                 for photo in data.get('photos', []):
                     img_url = photo['src']['large']
+                    # 'large' is the original scaled to fit 940x650
+                    scale = min(1.0, 940 / photo['width'], 650 / photo['height']) if photo.get('width') and photo.get('height') else None
                     results.append({
                         'id': f"pexels_img_{photo['id']}",  # Prefix with source
                         'type': 'image',
                         'download_url': img_url,
-                        'image': img_url 
+                        'image': img_url,
+                        'source': 'pexels_image',
+                        'width': round(photo['width'] * scale) if scale else None,
+                        'height': round(photo['height'] * scale) if scale else None,
                     })
         except Exception: pass
         return results
@@ -246,24 +447,75 @@ Answer: YES or NO"""
                             'id': f"pixabay_{v['id']}",  # Prefix with source
                             'type': 'video',
                             'download_url': vid_url,
-                            'image': thumb
+                            'image': thumb,
+                            'source': 'pixabay',
+                            'width': v['videos']['large'].get('width'),
+                            'height': v['videos']['large'].get('height'),
+                            'duration': v.get('duration'),
                         })
         except Exception: pass
         return results
 
-    def _download_file(self, url: str, filename: str, target_dir: str) -> str:
+    def _download_file(self, url: str, filename: str, target_dir: str, key: Optional[str] = None,
+                       duration: Optional[float] = None) -> str:
+        """
+        Places url at target_dir/filename, from the asset store when possible.
+        With a duration (videos, MEDIA_INGEST=range) only the leading seconds are fetched.
+        """
         filepath = os.path.join(target_dir, filename)
         if os.path.exists(filepath): return filepath
+        keys, trimmed_keys, seconds = self._asset_keys(url, key, filepath, duration)
+        # A full copy serves any duration; a trimmed one only its own. Separate lookups,
+        # so a trimmed hit never re-points the full keys at the trimmed copy.
+        if self.assets.get(keys, filepath) or (trimmed_keys and self.assets.get(trimmed_keys, filepath)):
+            print(f"      📦 Served from asset store: {key or url[:30]}")
+            return filepath
+        if seconds and self._supports_range(url):
+            trimmed = self.assets.put(trimmed_keys, filepath,
+                                      lambda tmp_path: self._fetch_leading(url, tmp_path, seconds))
+            if trimmed:
+                return trimmed
+            print("      ⚠️ Trimmed ingest failed. Downloading the whole file.")
+        return self.assets.put(keys, filepath, lambda tmp_path: self._fetch_url(url, tmp_path))
+
+    def _asset_keys(self, url: str, key: Optional[str], filepath: str, duration: Optional[float]):
+        """Asset store keys of a full copy, of a trimmed copy for this duration, and the trim length."""
+        keys = [f"url:{url}"] + ([f"id:{key}"] if key else [])
+        seconds = None
+        if duration and self.ingest_mode == "range" and filepath.endswith(".mp4"):
+            # Whole seconds plus a margin so nearby durations share one trimmed copy
+            seconds = math.ceil(duration) + 1
+        trimmed_keys = [f"{k}#t={seconds}" for k in keys] if seconds else []
+        return keys, trimmed_keys, seconds
+
+    def _supports_range(self, url: str) -> bool:
+        """One-byte probe: servers that honour ranges answer 206 Partial Content."""
+        try:
+            r = requests.get(url, headers={"User-Agent": USER_AGENT, "Range": "bytes=0-0"}, stream=True, timeout=10)
+            r.close()
+            return r.status_code == 206
+        except Exception:
+            return False
+
+    def _fetch_leading(self, url: str, filepath: str, seconds: int) -> bool:
+        """Remuxes only the first `seconds` of a remote video (no re-encode; ffmpeg reads via HTTP ranges)."""
+        try:
+            run_ffmpeg(["-user_agent", USER_AGENT, "-t", str(seconds), "-i", url,
+                        "-map", "0:v:0", "-c", "copy", "-movflags", "+faststart", filepath])
+            return os.path.getsize(filepath) > 0
+        except Exception as e:
+            print(f"      Trimmed Ingest Error ({url[:30]}...): {e}")
+            return False
+
+    def _fetch_url(self, url: str, filepath: str) -> bool:
         # User-Agent header is important for some sites (DDG results)
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
+        headers = {"User-Agent": USER_AGENT}
         try:
             r = requests.get(url, headers=headers, stream=True, timeout=10)
             r.raise_for_status()
             with open(filepath, 'wb') as f:
                 for chunk in r.iter_content(chunk_size=8192): f.write(chunk)
-            return filepath
+            return True
         except Exception as e: 
             print(f"      Download Error ({url[:30]}...): {e}")
-            return None
+            return False
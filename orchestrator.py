@@ -1,5 +1,7 @@
 import os
 import shutil
+import time
+from contextlib import contextmanager
 from datetime import datetime
 import re
 from typing import Callable, Optional
@@ -7,7 +9,7 @@ from dotenv import load_dotenv
 
 from agent import VideoDirector
 from media_fetcher import MediaFetcher
-from audio_generator import AudioGenerator
+from audio_generator import AudioGenerator, mp3_duration
 from video_editor import VideoAssembler
 from cloudinary_manager import CloudinaryManager
 from library_manager import LibraryManager
@@ -18,21 +20,52 @@ def slugify(text: str) -> str:
     return re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_')
 
 class VideoOrchestrator:
-    def __init__(self):
-        self.base_dir = os.path.abspath(os.path.dirname(__file__))
+    def __init__(self, director=None, fetcher=None, audio_gen=None, editor=None,
+                 cloudinary=None, library=None, base_dir: Optional[str] = None,
+                 narration_mode: Optional[str] = None, upload_mode: Optional[str] = None):
+        # Every collaborator can be injected (e.g. offline fakes in benchmark.py)
+        self.base_dir = base_dir or os.path.abspath(os.path.dirname(__file__))
         self.temp_base = os.path.join(self.base_dir, "data", "temp")
         self.result_base = os.path.join(self.base_dir, "data", "results")
         
-        self.director = VideoDirector()
-        self.fetcher = MediaFetcher()
-        self.audio_gen = AudioGenerator()
-        self.editor = VideoAssembler()
-        self.cloudinary = CloudinaryManager()
-        self.library = LibraryManager()
-
-    def create_video(self, user_prompt: str, progress_callback: Optional[Callable[[str], None]] = None):
+        self.director = director or VideoDirector()
+        self.fetcher = fetcher or MediaFetcher(data_dir=os.path.join(self.base_dir, "data"))
+        self.audio_gen = audio_gen or AudioGenerator()
+        self.editor = editor or VideoAssembler()
+        self.cloudinary = cloudinary or CloudinaryManager()
+        self.library = library or LibraryManager(os.path.join(self.base_dir, "data", "library.json"))
+        # Candidates are pre-ranked against the primary format's frame
+        if getattr(self.fetcher, "ranker", None):
+            self.fetcher.ranker.target_resolution = next(iter(self.editor.output_targets.values()))
+
+        # "oneshot" (one TTS stream split per scene) or "per_scene" (one stream per scene)
+        self.narration_mode = narration_mode or os.getenv("NARRATION_MODE", "oneshot")
+
+        # "file" uploads the finished video, "stream" uploads fragmented MP4 while it is encoded
+        self.upload_mode = upload_mode or os.getenv("UPLOAD_MODE", "file")
+
+        # Wall-clock seconds per stage of the last create_video() run
+        self.stage_timings = {}
+
+    @contextmanager
+    def _stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_timings[name] = time.perf_counter() - start
+
+    def _upload_output(self, path: str, public_id: str, stream=None) -> str:
+        """Finishes a streamed upload; uploads the finished file if streaming was off or failed."""
+        url = stream.finish() if stream else None
+        return url or self.cloudinary.upload_video(path, public_id=public_id)
+
+    def create_video(self, user_prompt: str, progress_callback: Optional[Callable[[str], None]] = None,
+                     session_id: Optional[str] = None, render_backend: Optional[str] = None):
         """
         Orchestrates the creation of a video from a prompt.
+        session_id overrides the generated "<timestamp>_<slug>" id (batch runs need unique ids).
+        render_backend ("moviepy" / "ffmpeg") overrides RENDER_BACKEND for this job.
         """
         def log(msg):
             print(msg)
@@ -42,7 +75,7 @@ class VideoOrchestrator:
         # 1. Setup Session
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         slug = slugify(user_prompt[:30])
-        session_id = f"{timestamp}_{slug}"
+        session_id = session_id or f"{timestamp}_{slug}"
         temp_dir = os.path.join(self.temp_base, session_id)
         result_dir = os.path.join(self.result_base, session_id)
         
@@ -50,60 +83,96 @@ class VideoOrchestrator:
         os.makedirs(result_dir, exist_ok=True)
         
         log(f"🚀 Starting Session: {session_id}")
+        self.stage_timings = {}
+        # Holds a lease on every stored asset this session uses until it finishes
+        self.fetcher.begin_session(session_id)
 
         try:
             # 2. Agent (Script & Plan)
             log("🧠 Director: Planning script and visuals...")
-            script_data = self.director.generate_script(user_prompt)
+            with self._stage("director"):
+                script_data = self.director.generate_script(user_prompt)
             timeline = script_data.get('timeline', [])
             
             if not timeline:
                 raise ValueError("Agent failed to generate a valid timeline.")
 
-            # 3. Media Fetching
+            # 3. Audio Generation (first, so media can be trimmed to each scene's length)
+            log("🎙️ Audio: Generatng voiceover...")
+            # Per-scene audio keeps visuals aligned to narration. In "oneshot" mode the
+            # whole script is synthesized in one TTS stream and split at word boundaries
+            # (one request instead of N, natural pacing across cuts).
+            scene_audio_paths = []
+            with self._stage("audio"):
+                if self.narration_mode == "oneshot":
+                    scene_audio_paths = self.audio_gen.generate_scene_narratives(
+                        [scene['script'] for scene in timeline], temp_dir)
+                else:
+                    for i, scene in enumerate(timeline):
+                         scene_audio_path = os.path.join(temp_dir, f"audio_{i}.mp3")
+                         # generate_narrative now returns (audio_path, subs_path)
+                         result = self.audio_gen.generate_narrative(scene['script'], scene_audio_path)
+                         scene_audio_paths.append(result)
+            
+            # 4. Media Fetching
             log(f"🎥 Media: Searching for {len(timeline)} scenes...")
             media_files = []
+            durations = [mp3_duration(audio_path) for audio_path, _ in scene_audio_paths]
             search_terms = [scene['visual_query'] for scene in timeline]
             # We fetch individually to map them to scenes
-            for i, scene in enumerate(timeline):
-                term = scene['visual_query']
-                log(f"   Downloading media for: {term}")
-                files = self.fetcher.download_media([term], temp_dir, max_items=1)
-                if files:
-                    media_files.append(files[0])
-                else:
-                    # Fallback or placeholder? For now, we skip or duplicate previous
-                    log(f"   ⚠️ Could not find media for {term}")
-                    media_files.append(None) # Handle in editor
+            with self._stage("media"):
+                for i, scene in enumerate(timeline):
+                    term = scene['visual_query']
+                    log(f"   Downloading media for: {term}")
+                    files = self.fetcher.download_media([term], temp_dir, max_items=1, durations=[durations[i]])
+                    # Recorded in the library so later videos can reuse it (QueryIndex)
+                    if self.fetcher.last_selections and self.fetcher.last_selections[0]:
+                        scene['media'] = self.fetcher.last_selections[0]
+                    if files:
+                        media_files.append(files[0])
+                    else:
+                        # Fallback or placeholder? For now, we skip or duplicate previous
+                        log(f"   ⚠️ Could not find media for {term}")
+                        media_files.append(None) # Handle in editor
 
-            # 4. Audio Generation
-            log("🎙️ Audio: Generatng voiceover...")
-            full_script = " ".join([scene['script'] for scene in timeline])
-            audio_path = os.path.join(temp_dir, "narration.mp3")
-            # We generate one full audio file for simplicity in this version, 
-            # ideally we'd generate per scene for precise alignment, but let's start simple.
-            # WAIT: agent.py generates a list of scenes with duration.
-            # To match visuals to audio, we should generate audio PER SCENE or use the estimated duration.
-            # MVP Pro approach: Generate FULL audio, but we need to know duration of each segment to cut video.
-            # Let's stick to full audio for flow, and try to time visuals to it?
-            # Actually, user wants "Fast cuts (every 2-3 seconds)".
-            # Let's generate audio per scene and concat? That ensures perfect alignment.
-            
-            scene_audio_paths = []
-            for i, scene in enumerate(timeline):
-                 scene_audio_path = os.path.join(temp_dir, f"audio_{i}.mp3")
-                 # generate_narrative now returns (audio_path, subs_path)
-                 result = self.audio_gen.generate_narrative(scene['script'], scene_audio_path)
-                 scene_audio_paths.append(result)
-            
             # 5. Video Assembly
             log("✂️ Editor: Assembling execution...")
-            final_video_path = os.path.join(result_dir, "final.mp4")
-            self.editor.assemble_video_from_timeline(timeline, media_files, scene_audio_paths, final_video_path)
+            targets = list(self.editor.output_targets)
+            if len(targets) > 1:
+                # One decode pass feeds every format (OUTPUT_FORMATS); the first is the primary
+                output_paths = {name: os.path.join(result_dir, f"final_{name}.mp4") for name in targets}
+            else:
+                output_paths = {targets[0]: os.path.join(result_dir, "final.mp4")}
+            public_ids = {name: session_id if i == 0 else f"{session_id}_{name}" for i, name in enumerate(targets)}
+
+            # UPLOAD_MODE=stream: chunks go up while the encoder is still writing
+            streams = {}
+            if self.upload_mode == "stream":
+                self.editor.fragmented_output = True
+                streams = {name: self.cloudinary.start_stream(path, public_ids[name])
+                           for name, path in output_paths.items()}
+            with self._stage("render"):
+                try:
+                    if len(targets) > 1:
+                        self.editor.assemble_multi_format(timeline, media_files, scene_audio_paths, output_paths,
+                                                          backend=render_backend)
+                    else:
+                        self.editor.assemble_video_from_timeline(
+                            timeline, media_files, scene_audio_paths, output_paths[targets[0]],
+                            backend=render_backend)
+                except Exception:
+                    for stream in streams.values():
+                        if stream:
+                            stream.abort()
+                    raise
 
             # 6. Cloudinary
             log("☁️ Cloud: Uploading to Cloudinary...")
-            cloud_url = self.cloudinary.upload_video(final_video_path, public_id=session_id)
+            outputs = {}
+            with self._stage("upload"):
+                for name, path in output_paths.items():
+                    outputs[name] = self._upload_output(path, public_ids[name], streams.get(name))
+            cloud_url = outputs[targets[0]]
             
             # 7. Library
             log("📚 Library: Saving record...")
@@ -112,32 +181,27 @@ class VideoOrchestrator:
                 "id": session_id,
                 "prompt": user_prompt,
                 "cloudinary_url": cloud_url,
+                "outputs": outputs,
                 "timestamp": timestamp,
                 "timeline": timeline 
             }
-            self.library.add_entry(video_record)
+            with self._stage("library"):
+                self.library.add_entry(video_record)
 
             # 8. Cleanup - Keep server lightweight!
             log("🧹 Cleanup: Removing temp and result files...")
+            with self._stage("cleanup"):
+                # Remove temp directory (fetched videos, audio files, etc.)
+                if os.path.exists(temp_dir):
+                    shutil.rmtree(temp_dir)
+                    log("   ✓ Removed temp directory")
             
-            # Remove temp directory (fetched videos, audio files, etc.)
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-                log("   ✓ Removed temp directory")
-            
-            # Remove result directory (final video is now on Cloudinary)
-            if os.path.exists(result_dir):
-                shutil.rmtree(result_dir)
-                log("   ✓ Removed result directory (video on Cloudinary)")
+                # Remove result directory (final video is now on Cloudinary)
+                if os.path.exists(result_dir):
+                    shutil.rmtree(result_dir)
+                    log("   ✓ Removed result directory (video on Cloudinary)")
             
-            # Clean up media directory (fetched stock videos)
-            media_dir = os.path.join(self.base_dir, "media")
-            if os.path.exists(media_dir):
-                for file in os.listdir(media_dir):
-                    file_path = os.path.join(media_dir, file)
-                    if os.path.isfile(file_path):
-                        os.remove(file_path)
-                log("   ✓ Cleaned up media directory")
+                # Stock media stays in the shared asset store (data/assets, LRU by ASSET_STORE_MB)
             
             log("✨ Video Creation Complete! (Video saved to Cloudinary)")
             return video_record
@@ -147,3 +211,5 @@ class VideoOrchestrator:
             import traceback
             traceback.print_exc()
             raise e
+        finally:
+            self.fetcher.end_session()
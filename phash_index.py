@@ -0,0 +1,153 @@
+"""
+Perceptual-hash (dHash) index of candidate thumbnails.
+
+The same stock shot often reaches us from several providers under different
+URLs/ids. Hashing the thumbnail lets MediaFetcher spot those repeats before it
+pays for a vision call or a download:
+- per session: anything near a thumbnail already used in this video is skipped
+- persistent: verdicts (accepted/rejected) are remembered per normalized query,
+  so a shot rejected for "pug sleeping" is never re-verified for that query
+"""
+import io
+import json
+import os
+import re
+import threading
+import time
+from typing import Optional, Tuple
+
+import requests
+from PIL import Image
+
+from file_utils import atomic_write_json, file_lock
+
+HASH_SIZE = 8  # 8x8 gradients -> 64-bit hash
+
+def dhash(image: Image.Image) -> int:
+    """Difference hash: sign of horizontal gradients on a 9x8 grayscale thumbnail."""
+    small = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+def normalize_query(query: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", query.lower()))
+
+class PerceptualIndex:
+    """
+    path: JSON file for persistent verdicts (None keeps everything in memory).
+    threshold: max Hamming distance (out of 64 bits) to count as the same shot.
+    """
+    def __init__(self, path: Optional[str] = "data/phash_index.json", threshold: Optional[int] = None,
+                 max_entries: int = 20000):
+        self.path = path
+        self.threshold = threshold if threshold is not None else int(os.getenv("PHASH_THRESHOLD", "8"))
+        self.max_entries = max_entries
+        self.headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
+        self._lock = threading.Lock()
+        self._entries = self._load()
+        self._new_entries = []
+        self._thumbs = {}  # url -> (hash, bytes, mime) for the current session
+        self.begin_session()
+
+    def _load(self) -> list:
+        if not self.path or not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return []
+
+    def begin_session(self):
+        """Forget per-video state (used shots, thumbnail cache); keep persistent verdicts."""
+        with self._lock:
+            self._session_used = []  # (hash, candidate id)
+            self._thumbs = {}
+
+    def fetch(self, url: str) -> Tuple[Optional[int], Optional[bytes], Optional[str]]:
+        """
+        Downloads and hashes a thumbnail. Returns (hash, bytes, mime type);
+        (None, None, None) when the image cannot be fetched or decoded.
+        """
+        if url in self._thumbs:
+            return self._thumbs[url]
+        result = (None, None, None)
+        try:
+            r = requests.get(url, headers=self.headers, timeout=10)
+            r.raise_for_status()
+            image = Image.open(io.BytesIO(r.content))
+            mime = Image.MIME.get(image.format, "image/jpeg")
+            result = (dhash(image), r.content, mime)
+        except Exception as e:
+            print(f"      pHash Error ({url[:30]}...): {e}")
+        self._thumbs[url] = result
+        return result
+
+    def used_match(self, h: int) -> Optional[str]:
+        """Id of a shot already used in this session within threshold, if any."""
+        with self._lock:
+            for used_hash, cand_id in self._session_used:
+                if hamming(h, used_hash) <= self.threshold:
+                    return cand_id
+        return None
+
+    def verdict(self, h: int, query: str) -> Optional[str]:
+        """'accepted' / 'rejected' if a near-identical shot was judged for this query before."""
+        query = normalize_query(query)
+        best = None
+        with self._lock:
+            for entry in self._entries:
+                if entry["query"] != query:
+                    continue
+                distance = hamming(h, int(entry["hash"], 16))
+                if distance <= self.threshold and (best is None or distance < best[0]):
+                    best = (distance, entry["verdict"])
+        return best[1] if best else None
+
+    def _record(self, h: int, cand_id: str, query: str, verdict: str):
+        entry = {"hash": f"{h:016x}", "query": normalize_query(query), "verdict": verdict,
+                 "id": cand_id, "ts": int(time.time())}
+        self._entries.append(entry)
+        self._new_entries.append(entry)
+
+    def mark_used(self, h: int, cand_id: str):
+        """This video uses the shot (per session only; says nothing about relevance)."""
+        with self._lock:
+            self._session_used.append((h, cand_id))
+
+    def mark_accepted(self, h: int, cand_id: str, query: str):
+        """The vision model said YES for this query (persisted)."""
+        with self._lock:
+            self._record(h, cand_id, query, "accepted")
+
+    def mark_rejected(self, h: int, cand_id: str, query: str):
+        """The vision model said NO for this query (persisted)."""
+        with self._lock:
+            self._record(h, cand_id, query, "rejected")
+
+    def save(self):
+        """Merges new verdicts into the index file (atomic replace, newest entries kept)."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._new_entries:
+                return
+            # Batch workers share the file: merge under the cross-process lock
+            with file_lock(self.path):
+                entries = self._load()
+                seen = {(e["hash"], e["query"], e["verdict"]) for e in entries}
+                for e in self._new_entries:
+                    if (e["hash"], e["query"], e["verdict"]) not in seen:
+                        entries.append(e)
+                entries = entries[-self.max_entries:]
+                atomic_write_json(self.path, entries)
+            self._entries = entries
+            self._new_entries = []
@@ -0,0 +1,108 @@
+"""
+Query-to-media reuse index built from library history.
+
+Every finished video in data/library.json records, per scene, the visual_query
+and the media that was accepted for it. This index maps normalized query tokens
+to those picks so MediaFetcher can answer a query it has (nearly) seen before
+without a provider search or a vision call:
+- similarity >= QUERY_REUSE_THRESHOLD (default 0.9): reused as is
+- similarity >= QUERY_VERIFY_THRESHOLD (default 0.6): tried first, but verified
+Similarity is the Jaccard overlap of the two queries' token sets.
+"""
+import json
+import os
+from typing import Iterable, Optional, Tuple
+
+from phash_index import normalize_query
+
+STOPWORDS = {"a", "an", "the", "of", "and", "with", "in", "on", "at", "to", "its", "his", "her"}
+
+def query_tokens(query: str) -> frozenset:
+    tokens = set()
+    for token in normalize_query(query).split():
+        if token in STOPWORDS or token.isdigit():
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]  # "dogs" ~ "dog"
+        tokens.add(token)
+    return frozenset(tokens)
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+class QueryIndex:
+    """
+    library_path: the LibraryManager file to learn from (None: in-memory only).
+    Entries are only ever appended to the library, so refresh() indexes just the
+    videos it has not seen yet, and skips reading when the file is unchanged.
+    """
+    def __init__(self, library_path: Optional[str] = "data/library.json",
+                 reuse_threshold: Optional[float] = None, verify_threshold: Optional[float] = None):
+        self.library_path = library_path
+        self.reuse_threshold = reuse_threshold if reuse_threshold is not None else float(
+            os.getenv("QUERY_REUSE_THRESHOLD", "0.9"))
+        self.verify_threshold = verify_threshold if verify_threshold is not None else float(
+            os.getenv("QUERY_VERIFY_THRESHOLD", "0.6"))
+        self._entries = []   # (tokens, media, video id)
+        self._postings = {}  # token -> [entry index]
+        self._video_ids = set()
+        self._stamp = None
+        self.refresh()
+
+    def refresh(self):
+        if not self.library_path:
+            return
+        try:
+            stat = os.stat(self.library_path)
+        except OSError:
+            return
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return
+        try:
+            with open(self.library_path, "r") as f:
+                records = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        self._stamp = stamp
+        added = sum(self.add_record(record) for record in records)
+        if added:
+            print(f"   🗂️ Query index: +{added} scenes ({len(self._entries)} total)")
+
+    def add_record(self, record: dict) -> int:
+        """Indexes one library record (once). Returns the number of scenes added."""
+        video_id = record.get("id")
+        if video_id in self._video_ids:
+            return 0
+        self._video_ids.add(video_id)
+        added = 0
+        for scene in record.get("timeline") or []:
+            media = scene.get("media")
+            tokens = query_tokens(scene.get("visual_query", ""))
+            if not media or not media.get("id") or not tokens:
+                continue
+            for token in tokens:
+                self._postings.setdefault(token, []).append(len(self._entries))
+            self._entries.append((tokens, media, video_id))
+            added += 1
+        return added
+
+    def lookup(self, query: str, exclude_ids: Iterable[str] = ()) -> Optional[Tuple[dict, float]]:
+        """
+        Best previous pick for query as (media, similarity), or None below
+        verify_threshold. Newer picks win ties; ids in exclude_ids are skipped.
+        """
+        tokens = query_tokens(query)
+        exclude_ids = set(exclude_ids)
+        best = None
+        candidates = sorted({i for token in tokens for i in self._postings.get(token, [])}, reverse=True)
+        for i in candidates:
+            entry_tokens, media, _ = self._entries[i]
+            if media["id"] in exclude_ids:
+                continue
+            score = jaccard(tokens, entry_tokens)
+            if best is None or score > best[1]:
+                best = (media, score)
+        if best and best[1] >= self.verify_threshold:
+            return best
+        return None
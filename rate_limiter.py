@@ -0,0 +1,211 @@
+"""
+Process-wide rate limiter for Gemini calls.
+
+Two token buckets (requests/minute and tokens/minute) guard every call made by
+VideoDirector and MediaFetcher's vision verifier. Waiters are served strictly by
+priority (director before verification), then FIFO. 429 / RESOURCE_EXHAUSTED
+responses push the whole limiter back by the server's retry delay so concurrent
+jobs stop hammering the quota together.
+"""
+import heapq
+import itertools
+import os
+import re
+import threading
+import time
+from typing import Callable, Optional
+
+PRIORITY_DIRECTOR = 0
+PRIORITY_VERIFY = 10
+
+# Gemini bills roughly this many tokens per image part
+IMAGE_TOKENS = 258
+
+class MonotonicClock:
+    """Real time."""
+    def now(self) -> float:
+        return time.monotonic()
+
+    def wait(self, cond: threading.Condition, timeout: Optional[float]):
+        cond.wait(timeout)
+
+class ManualClock:
+    """
+    Deterministic clock for offline tests.
+    auto_advance=True: waiting with a timeout advances time instantly instead of sleeping.
+    auto_advance=False: time only moves on advance(), so several threads can be queued
+    on the limiter at once (timed waits re-check every few real milliseconds).
+    """
+    def __init__(self, start: float = 0.0, auto_advance: bool = True):
+        self.t = start
+        self.auto_advance = auto_advance
+
+    def now(self) -> float:
+        return self.t
+
+    def advance(self, seconds: float):
+        self.t += seconds
+
+    def wait(self, cond: threading.Condition, timeout: Optional[float]):
+        if timeout is None:
+            cond.wait()
+        elif self.auto_advance:
+            self.t += timeout
+        else:
+            cond.wait(0.005)
+
+class _Bucket:
+    def __init__(self, per_minute: float, capacity: float, now: float):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = now
+
+    def refill(self, now: float):
+        if now > self.updated:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def time_until(self, amount: float) -> float:
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+def estimate_tokens(text: str, images: int = 0) -> int:
+    """Cheap token estimate (~4 chars/token) used to reserve TPM before a call."""
+    return max(1, len(text) // 4) + images * IMAGE_TOKENS
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    text = f"{type(exc).__name__} {exc}"
+    return "429" in text or "RESOURCE_EXHAUSTED" in text or "ResourceExhausted" in text
+
+_RETRY_PATTERNS = [
+    re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"['\"]retryDelay['\"]:\s*['\"]([\d.]+)s['\"]"),
+]
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Extracts the server-suggested retry delay from a quota error, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After") if hasattr(headers, "get") else None
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    text = str(exc)
+    for pattern in _RETRY_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return float(match.group(1))
+    return None
+
+class RateLimiter:
+    """
+    Token-bucket limiter with priority queuing.
+    rpm / tpm: sustained requests and tokens per minute.
+    burst: how many requests may go out back-to-back after an idle period.
+    """
+    def __init__(self, rpm: float, tpm: float, burst: Optional[int] = None,
+                 max_retries: int = 3, clock=None):
+        self.clock = clock or MonotonicClock()
+        self.max_retries = max_retries
+        now = self.clock.now()
+        burst = burst or max(1, int(rpm // 10))
+        self.requests = _Bucket(rpm, burst, now)
+        # Token capacity scales with the request burst so both budgets smooth out alike
+        self.tokens = _Bucket(tpm, max(tpm * burst / rpm, 1), now)
+        self.blocked_until = now
+
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._seq = itertools.count()
+
+    def acquire(self, tokens: int = 1, priority: int = PRIORITY_VERIFY):
+        """Blocks until this caller is first in line and both buckets can pay."""
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    now = self.clock.now()
+                    self.requests.refill(now)
+                    self.tokens.refill(now)
+                    timeout = None
+                    if self._waiters[0] == ticket:
+                        timeout = max(self.blocked_until - now,
+                                      self.requests.time_until(1),
+                                      self.tokens.time_until(tokens))
+                        if timeout <= 0:
+                            self.requests.take(1)
+                            self.tokens.take(tokens)
+                            return
+                    self.clock.wait(self._cond, timeout)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def backoff(self, seconds: float):
+        """Pauses every caller for `seconds` (honors server retry-after)."""
+        with self._cond:
+            self.blocked_until = max(self.blocked_until, self.clock.now() + seconds)
+            self._cond.notify_all()
+
+    def record_usage(self, estimated: int, actual: int):
+        """Corrects the token bucket once the real usage of a call is known."""
+        with self._cond:
+            self.tokens.level -= (actual - estimated)
+            self._cond.notify_all()
+
+    def call(self, fn: Callable, tokens: int = 1, priority: int = PRIORITY_VERIFY):
+        """
+        Runs fn() under the limiter, retrying quota errors up to max_retries times.
+        The last quota error is re-raised so callers decide how to degrade.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire(tokens, priority)
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                delay = retry_after_seconds(e) or min(60.0, 2.0 * 2 ** attempt)
+                print(f"      ⏳ Gemini quota hit, backing off {delay:.1f}s...")
+                self.backoff(delay)
+                continue
+            usage = getattr(result, "usage_metadata", None) or {}
+            if usage.get("total_tokens"):
+                self.record_usage(tokens, usage["total_tokens"])
+            return result
+
+_gemini_limiter = None
+_gemini_lock = threading.Lock()
+
+def gemini_limiter() -> RateLimiter:
+    """
+    The shared limiter for this process, configured from the environment:
+    GEMINI_RPM (default 10), GEMINI_TPM (default 250000), GEMINI_BURST (optional).
+    """
+    global _gemini_limiter
+    with _gemini_lock:
+        if _gemini_limiter is None:
+            burst = os.getenv("GEMINI_BURST")
+            _gemini_limiter = RateLimiter(
+                rpm=float(os.getenv("GEMINI_RPM", "10")),
+                tpm=float(os.getenv("GEMINI_TPM", "250000")),
+                burst=int(burst) if burst else None,
+            )
+        return _gemini_limiter
+
+def set_gemini_limiter(limiter: Optional[RateLimiter]):
+    """Replaces the shared limiter (benchmarks, tests). None resets to env defaults."""
+    global _gemini_limiter
+    with _gemini_lock:
+        _gemini_limiter = limiter
@@ -0,0 +1,87 @@
+"""
+Samples peak memory and file-descriptor usage of this process (and its ffmpeg
+children) while a block of code runs. Linux reads /proc; elsewhere only the
+getrusage() peak RSS of this process is available.
+"""
+import os
+import resource
+import sys
+import threading
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def _rss_bytes(pid) -> int:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def _fd_count(pid) -> int:
+    try:
+        return len(os.listdir(f"/proc/{pid}/fd"))
+    except OSError:
+        return 0
+
+def _children(pid) -> list:
+    children = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                children.extend(int(c) for c in f.read().split())
+    except OSError:
+        pass
+    return children
+
+class ResourceMonitor:
+    """
+    Usage:
+        with ResourceMonitor() as mon:
+            render()
+        print(mon.stats())
+    """
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_children_rss = 0
+        self.peak_fds = 0
+        self.peak_children = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._has_proc = os.path.isdir("/proc/self/fd")
+
+    def sample(self):
+        pid = os.getpid()
+        if self._has_proc:
+            children = _children(pid)
+            self.peak_rss = max(self.peak_rss, _rss_bytes(pid))
+            self.peak_children_rss = max(self.peak_children_rss, sum(_rss_bytes(c) for c in children))
+            self.peak_fds = max(self.peak_fds, _fd_count(pid))
+            self.peak_children = max(self.peak_children, len(children))
+        else:
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # ru_maxrss is bytes on macOS, kilobytes on Linux/BSD
+            self.peak_rss = max(self.peak_rss, maxrss if sys.platform == "darwin" else maxrss * 1024)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    def stats(self) -> dict:
+        return {
+            "peak_rss_mb": round(self.peak_rss / 2**20, 1),
+            "peak_children_rss_mb": round(self.peak_children_rss / 2**20, 1),
+            "peak_fds": self.peak_fds,
+            "peak_child_processes": self.peak_children,
+        }
@@ -0,0 +1,111 @@
+"""
+Uploads a video while it is still being encoded.
+
+The encoder writes fragmented MP4 (see VideoAssembler.fragmented_output), which is
+only ever appended to. A background thread tails the growing file and sends each
+full chunk with Cloudinary's chunked-upload protocol (X-Unique-Upload-Id plus a
+Content-Range of "bytes start-end/-1" until the total size is known). finish() sends
+the tail with the real total, so the video is in the cloud moments after the last
+frame is encoded.
+"""
+import hashlib
+import os
+import threading
+import uuid
+from typing import Optional
+
+import requests
+
+DEFAULT_CHUNK_MB = 6  # Cloudinary requires >= 5 MB for every chunk but the last
+
+class StreamingUpload:
+    """
+    Usage:
+        upload = StreamingUpload(path, url, params).start()
+        encode(path)
+        url = upload.finish()   # None on failure -> upload the finished file instead
+    """
+    def __init__(self, file_path: str, url: str, params: dict, chunk_size: Optional[int] = None,
+                 poll_interval: float = 0.25, timeout: float = 120):
+        self.file_path = file_path
+        self.url = url
+        self.params = params
+        self.chunk_size = chunk_size or int(float(os.getenv("STREAM_CHUNK_MB", DEFAULT_CHUNK_MB)) * 2**20)
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.upload_id = uuid.uuid4().hex
+        self.sent = 0
+        self.chunks = 0
+        self.error = None
+        self._sent_hash = hashlib.sha256()
+        self._finished = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _post(self, data: bytes, total: Optional[int] = None) -> dict:
+        end = self.sent + len(data) - 1
+        headers = {
+            "X-Unique-Upload-Id": self.upload_id,
+            "Content-Range": f"bytes {self.sent}-{end}/{total if total is not None else -1}",
+        }
+        files = {"file": (os.path.basename(self.file_path), data, "video/mp4")}
+        response = requests.post(self.url, data=self.params, files=files, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        self._sent_hash.update(data)
+        self.sent += len(data)
+        self.chunks += 1
+        return response.json()
+
+    def _send_available(self, f, keep: int):
+        """Sends full chunks while more than `keep` bytes would remain unsent."""
+        while os.path.getsize(self.file_path) - self.sent - keep >= self.chunk_size:
+            f.seek(self.sent)
+            self._post(f.read(self.chunk_size))
+
+    def _run(self):
+        try:
+            while not os.path.exists(self.file_path):
+                if self._finished.wait(self.poll_interval):
+                    return
+            with open(self.file_path, "rb") as f:
+                while not self._finished.is_set():
+                    # Hold one byte back so the final request (with the total) is never empty
+                    self._send_available(f, keep=1)
+                    self._finished.wait(self.poll_interval)
+        except Exception as e:
+            self.error = e
+
+    def abort(self):
+        self._finished.set()
+        if self._thread:
+            self._thread.join()
+
+    def finish(self) -> Optional[str]:
+        """Call once the encoder has closed the file. Returns the uploaded URL, or None."""
+        self.abort()
+        try:
+            if self.error:
+                raise self.error
+            with open(self.file_path, "rb") as f:
+                # The muxer must not have rewritten bytes that were already sent
+                prefix = hashlib.sha256()
+                for chunk in iter(lambda: f.read(min(2**20, self.sent - f.tell())), b""):
+                    prefix.update(chunk)
+                if prefix.digest() != self._sent_hash.digest():
+                    raise RuntimeError("output changed after it was streamed")
+                self._send_available(f, keep=1)
+                total = os.path.getsize(self.file_path)
+                f.seek(self.sent)
+                result = self._post(f.read(), total=total)
+            url = result.get("secure_url")
+            if not url:
+                raise RuntimeError(f"no URL in final response: {result}")
+            print(f"   ✅ Streamed upload: {url} ({self.chunks} chunks)")
+            return url
+        except Exception as e:
+            print(f"   ⚠️ Streaming upload failed ({e}). Uploading the finished file instead.")
+            return None
@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+import asset_store
+from asset_store import AssetStore
+
+class FakeTime:
+    def __init__(self):
+        self.t = 1_000_000.0
+
+    def time(self):
+        return self.t
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(asset_store, "time", clock)
+    return clock
+
+def writer(data: bytes):
+    def download(tmp_path):
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        return True
+    return download
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def test_put_then_get_serves_the_stored_copy(tmp_path, clock):
+    store = AssetStore(str(tmp_path / "assets"))
+    dest = tmp_path / "a.mp4"
+    assert store.put(["id:a"], str(dest), writer(b"clip")) == str(dest)
+    os.remove(dest)
+    assert store.get(["id:a"], str(dest)) == str(dest)
+    assert read(dest) == b"clip"
+    assert store.get(["id:missing"], str(tmp_path / "b.mp4")) is None
+
+def test_failed_download_stores_nothing(tmp_path, clock):
+    store = AssetStore(str(tmp_path / "assets"))
+    assert store.put(["id:a"], str(tmp_path / "a.mp4"), lambda tmp_path: False) is None
+    assert store.lookup(["id:a"]) is None
+    assert os.listdir(store.tmp_dir) == []
+
+def test_same_bytes_under_two_keys_share_one_object(tmp_path, clock):
+    store = AssetStore(str(tmp_path / "assets"))
+    store.put(["url:x"], str(tmp_path / "x.jpg"), writer(b"same"))
+    store.put(["url:y"], str(tmp_path / "y.jpg"), writer(b"same"))
+    assert store.lookup(["url:x"]) == store.lookup(["url:y"])
+    assert len(store._load()["objects"]) == 1
+
+def test_gc_evicts_least_recently_used_unreferenced_objects(tmp_path, clock):
+    # Quota fits two of the three 1000-byte objects
+    store = AssetStore(str(tmp_path / "assets"), quota_mb=2500 / 2**20)
+    store.begin_session("s1")
+    for name in "abc":
+        clock.t += 1
+        store.put([f"id:{name}"], str(tmp_path / f"{name}.mp4"), writer(name.encode() * 1000))
+    # Held by the session: nothing can go yet
+    assert all(store.lookup([f"id:{n}"]) for n in "abc")
+    clock.t += 1
+    store.get(["id:a"], str(tmp_path / "a2.mp4"))  # a is now the most recently used
+    store.end_session()
+    assert store.lookup(["id:b"]) is None
+    assert store.lookup(["id:a"]) and store.lookup(["id:c"])
+
+def test_gc_keeps_leased_objects_until_the_lease_expires(tmp_path, clock):
+    store = AssetStore(str(tmp_path / "assets"), quota_mb=1500 / 2**20, lease_hours=1)
+    crashed = AssetStore(str(tmp_path / "assets"), quota_mb=1500 / 2**20, lease_hours=1)
+    crashed.begin_session("crashed")
+    crashed.put(["id:old"], str(tmp_path / "old.mp4"), writer(b"o" * 1000))  # never released
+
+    store.begin_session("s2")
+    clock.t += 60
+    store.put(["id:new"], str(tmp_path / "new.mp4"), writer(b"n" * 1000))
+    store.end_session()
+    # Over quota: only the unreferenced object can go, even though it is newer
+    assert store.lookup(["id:old"])
+    assert store.lookup(["id:new"]) is None
+
+    clock.t += 3600
+    store.begin_session("s3")
+    store.put(["id:fresh"], str(tmp_path / "fresh.mp4"), writer(b"f" * 1000))
+    store.end_session()
+    assert store.lookup(["id:old"]) is None
+    assert store.lookup(["id:fresh"])
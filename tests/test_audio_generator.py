@@ -0,0 +1,110 @@
+import asyncio
+import io
+import json
+import math
+import os
+import struct
+import wave
+from pathlib import Path
+
+import pytest
+
+from audio_generator import _mp3_frames, build_narration_track, mp3_duration
+from benchmark_fakes import FakeAudioGenerator, FakeCommunicate, _tone_mp3
+
+def sine_wav(seconds: float, frequency: int, rate: int = 16000) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"".join(struct.pack("<h", int(12000 * math.sin(2 * math.pi * frequency * i / rate)))
+                               for i in range(int(seconds * rate))))
+    return buf.getvalue()
+
+def write(path, data: bytes) -> str:
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+def test_parses_tts_style_mp3():
+    frames = _mp3_frames(_tone_mp3(1.0, 440))
+    assert frames
+    # 24 kHz MPEG-2 Layer III: 576 samples per frame
+    assert all(seconds == 576 / 24000 for _, _, seconds in frames)
+    assert sum(s for _, _, s in frames) == pytest.approx(1.0, abs=0.1)
+
+def test_frames_are_contiguous():
+    data = _tone_mp3(0.5, 440)
+    frames = _mp3_frames(data)
+    for (offset, length, _), (next_offset, _, _) in zip(frames, frames[1:]):
+        assert offset + length == next_offset
+
+@pytest.mark.parametrize("frequency", range(200, 3200, 50))
+def test_wav_is_never_taken_for_mp3(frequency):
+    assert _mp3_frames(sine_wav(2.0, frequency)) is None
+
+def test_mp3_inside_other_data_is_rejected():
+    assert _mp3_frames(os.urandom(300) + _tone_mp3(0.5, 440)) is None
+    data = bytearray(_tone_mp3(0.5, 440))
+    offset, length, _ = _mp3_frames(bytes(data))[3]
+    data[offset:offset + 4] = b"\x00\x00\x00\x00"  # break a header mid-stream
+    assert _mp3_frames(bytes(data)) is None
+
+def test_truncated_last_frame_and_id3v1_tag_are_tolerated():
+    data = _tone_mp3(0.5, 440)
+    frames = _mp3_frames(data)
+    assert len(_mp3_frames(data[:-5])) == len(frames) - 1
+    assert len(_mp3_frames(data + b"TAG" + bytes(125))) == len(frames)
+
+def test_matching_mp3s_are_joined_without_decoding(tmp_path):
+    paths = [write(tmp_path / f"a{i}.mp3", _tone_mp3(d, f)) for i, (d, f) in enumerate([(1.3, 300), (2.1, 600)])]
+    track, durations = build_narration_track(paths, str(tmp_path / "track"))
+    assert track.endswith(".mp3")
+    assert durations == [mp3_duration(p) for p in paths]
+    assert mp3_duration(track) == pytest.approx(sum(durations))
+
+def test_other_formats_fall_back_to_one_pcm_track(tmp_path):
+    paths = [write(tmp_path / "a.mp3", _tone_mp3(1.0, 300)), write(tmp_path / "b.wav", sine_wav(1.5, 500))]
+    assert mp3_duration(paths[1]) is None
+    track, durations = build_narration_track(paths, str(tmp_path / "track"))
+    assert track.endswith(".wav")
+    assert durations[1] == pytest.approx(1.5, abs=1e-3)
+    with wave.open(track) as w:
+        assert w.getnframes() / w.getframerate() == pytest.approx(sum(durations))
+
+SCRIPTS = ["Pugs love naps.", "They snore loudly at night.", "Then they wake up hungry."]
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+def full_stream(text: str) -> bytes:
+    async def collect():
+        return b"".join([c["data"] async for c in FakeCommunicate(text).stream() if c["type"] == "audio"])
+    return asyncio.run(collect())
+
+def test_one_pass_narration_splits_per_scene(tmp_path):
+    generator = FakeAudioGenerator()
+    results = generator.generate_scene_narratives(SCRIPTS, str(tmp_path))
+    assert generator.requests == 1
+    assert not os.path.exists(tmp_path / "audio_full.mp3")
+
+    for script, (_, subs_path) in zip(SCRIPTS, results):
+        subs = read_json(subs_path)
+        assert [s["word"] for s in subs] == script.rstrip(".").split()
+        assert 0 <= subs[0]["start"] < 0.3  # rebased to the scene's own file
+
+    data = full_stream(" ".join(SCRIPTS))
+    frames = _mp3_frames(data)
+    joined = b"".join(Path(audio_path).read_bytes() for audio_path, _ in results)
+    assert joined == data[frames[0][0]:frames[-1][0] + frames[-1][1]]  # cut on frame edges, nothing re-encoded
+
+def test_scene_without_words_falls_back_to_per_scene_requests(tmp_path):
+    generator = FakeAudioGenerator()
+    scripts = ["Pugs love naps.", "...", "Then they wake up hungry."]
+    results = generator.generate_scene_narratives(scripts, str(tmp_path))
+    assert generator.requests == 1 + len(scripts)
+    assert [os.path.basename(a) for a, _ in results] == ["audio_0.mp3", "audio_1.mp3", "audio_2.mp3"]
+    assert read_json(results[1][1]) == []
+    assert not os.path.exists(tmp_path / "audio_full.mp3")
@@ -0,0 +1,60 @@
+import json
+
+from batch import Manifest, load_prompts
+
+def write_lines(path, *objs):
+    """Writes one JSON value per line; bytes are written as is (malformed lines)."""
+    path.write_text("\n".join(o.decode() if isinstance(o, bytes) else json.dumps(o) for o in objs) + "\n")
+    return str(path)
+
+def test_load_prompts_reads_every_line_shape(tmp_path):
+    path = write_lines(tmp_path / "prompts.jsonl",
+                       "a plain string",
+                       {"id": "p1", "prompt": "prompt field"},
+                       {"request_id": "user-001", "title": "Title", "body": "Body text"},
+                       b"{not json",
+                       {"id": "empty"})
+    items = load_prompts(path)
+    assert items[1:] == [("p1", "prompt field"), ("user-001", "Title\n\nBody text")]
+    assert items[0][1] == "a plain string" and len(items[0][0]) == 12  # hash id
+    assert load_prompts(path, prompt_field="title")[1:] == [("user-001", "Title")]
+
+def test_duplicate_ids_keep_the_first(tmp_path):
+    path = write_lines(tmp_path / "prompts.jsonl",
+                       {"id": "x", "prompt": "first"}, {"id": "x", "prompt": "second"},
+                       "same text", "same text")
+    items = load_prompts(path)
+    assert [prompt for _, prompt in items] == ["first", "same text"]
+
+def test_crash_puts_queued_items_back_to_pending(tmp_path):
+    path = str(tmp_path / "batch" / "run.manifest.json")
+    prompts = [("a", "one"), ("b", "two")]
+    manifest = Manifest(path, "prompts.jsonl")
+    manifest.sync(prompts)
+    manifest.update("a", status="queued", attempts=1)  # run dies here
+
+    resumed = Manifest(path, "prompts.jsonl")
+    resumed.sync(prompts)
+    assert resumed.items["a"] == {"prompt": "one", "status": "pending", "attempts": 1}
+    assert resumed.todo(prompts, max_attempts=3) == prompts
+
+def test_todo_skips_done_and_exhausted_items(tmp_path):
+    prompts = [("done", "1"), ("failed", "2"), ("exhausted", "3"), ("new", "4")]
+    manifest = Manifest(str(tmp_path / "m.json"), "prompts.jsonl")
+    manifest.sync(prompts)
+    manifest.update("done", status="done", attempts=1)
+    manifest.update("failed", status="failed", attempts=2)
+    manifest.update("exhausted", status="failed", attempts=3)
+    assert manifest.todo(prompts, max_attempts=3) == [("failed", "2"), ("new", "4")]
+    assert manifest.todo(prompts, max_attempts=2) == [("new", "4")]
+    assert manifest.counts() == {"done": 1, "failed": 2, "pending": 1}
+
+def test_sync_adds_new_prompts_and_keeps_progress(tmp_path):
+    path = str(tmp_path / "m.json")
+    manifest = Manifest(path, "prompts.jsonl")
+    manifest.sync([("a", "one")])
+    manifest.update("a", status="done", attempts=1, result={"video_id": "v1"})
+    manifest = Manifest(path, "prompts.jsonl")
+    manifest.sync([("a", "one (edited)"), ("b", "two")])
+    assert manifest.items["a"]["status"] == "done" and manifest.items["a"]["prompt"] == "one (edited)"
+    assert manifest.items["b"] == {"prompt": "two", "status": "pending", "attempts": 0}
@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from candidate_ranker import CandidateRanker
+
+def cand(cid, kind="video", source="pexels_video", **meta):
+    return {"id": cid, "type": kind, "source": source, **meta}
+
+@pytest.fixture
+def ranker():
+    return CandidateRanker(target_resolution=(1080, 1920), log_path=None, min_score=0.35)
+
+def test_portrait_hd_video_beats_landscape_and_short_clips(ranker):
+    candidates = [
+        cand("landscape", width=3840, height=2160, duration=20),
+        cand("short", width=1080, height=1920, duration=2),
+        cand("ideal", width=1080, height=1920, duration=10),
+    ]
+    kept, _ = ranker.rank(candidates, "dog", scene_duration=6.0)
+    assert [c["id"] for c in kept] == ["ideal", "short", "landscape"]
+
+def test_orientation_is_the_fraction_kept_by_the_crop(ranker):
+    _, parts, _ = ranker.score(cand("a", width=1920, height=1080, duration=10), 5.0)
+    assert parts["orientation"] == pytest.approx((9 / 16) ** 2, abs=1e-3)
+    assert parts["resolution"] == pytest.approx(1080 / 1920, abs=1e-3)  # 1.78x upscale to cover
+
+def test_hopeless_candidates_are_dropped_unless_nothing_else_is_left(ranker):
+    tiny = cand("tiny", kind="image", source="ddg", width=200, height=150)
+    kept, rows = ranker.rank([tiny, cand("ok", width=1080, height=1920, duration=8)], "dog", 5.0)
+    assert [c["id"] for c in kept] == ["ok"]
+    assert {r["id"]: r["outcome"] for r in rows} == {"tiny": "dropped", "ok": None}
+
+    kept, rows = ranker.rank([tiny], "dog", 5.0)
+    assert [c["id"] for c in kept] == ["tiny"]  # a weak shot beats a black frame
+    assert rows[0]["dropped"] is None
+
+def test_missing_metadata_scores_neutral_and_keeps_provider_order(ranker):
+    kept, rows = ranker.rank([cand("first"), cand("second")], "dog")
+    assert [c["id"] for c in kept] == ["first", "second"]
+    assert rows[0]["score"] == rows[1]["score"]
+
+def test_record_appends_scores_with_outcomes(tmp_path):
+    path = tmp_path / "scores.jsonl"
+    ranker = CandidateRanker(log_path=str(path))
+    _, rows = ranker.rank([cand("a", width=1080, height=1920, duration=8), cand("b")], "dog", 5.0)
+    ranker.record(rows, {"a": "selected"})
+    ranker.record(rows, {"b": "rejected"})
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(l["id"], l["rank"], l["outcome"]) for l in lines] == [
+        ("a", 0, "selected"), ("b", 1, None), ("a", 0, None), ("b", 1, "rejected")]
@@ -0,0 +1,62 @@
+import json
+import os
+
+import pytest
+
+from ffmpeg_renderer import FFmpegRenderer, _ass_text, _ass_time, _filter_value
+from ffmpeg_tools import run_ffmpeg
+from video_editor import VideoAssembler
+
+FONT = VideoAssembler().font_bold
+
+def unescape(value: str) -> str:
+    """One level of ffmpeg backslash unescaping: '\\x' becomes 'x'."""
+    out, chars = [], iter(value)
+    for ch in chars:
+        out.append(next(chars) if ch == "\\" else ch)
+    return "".join(out)
+
+def dialogues(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.split(",", 9) for line in f if line.startswith("Dialogue:")]
+
+def test_ass_time_format():
+    assert _ass_time(0) == "0:00:00.00"
+    assert _ass_time(3723.456) == "1:02:03.46"
+    assert _ass_time(-1) == "0:00:00.00"
+
+def test_ass_text_escapes_override_blocks():
+    assert _ass_text("a{\\b1}b") == "a\\{\\\\b1\\}b"
+    assert _ass_text("two\nlines") == "two\\Nlines"
+
+@pytest.mark.parametrize("path", ["/tmp/a:b/c.ass", "/tmp/it's/c.ass", "/tmp/a,b;[c]/d.ass", "C:\\subs\\x.ass"])
+def test_filter_value_survives_both_parsing_levels(path):
+    assert unescape(unescape(_filter_value(path))) == path
+
+@pytest.mark.skipif(not os.path.exists(FONT), reason="DejaVu font not installed")
+def test_subtitles_filter_opens_escaped_path(tmp_path):
+    work = tmp_path / "it's: a, b"
+    work.mkdir()
+    renderer = FFmpegRenderer(FONT)
+    ass_path = str(work / "captions.ass")
+    renderer.write_ass(ass_path, [{"text_overlay": "hi"}], [None], [0.0, 0.5], (64, 64))
+    run_ffmpeg(["-f", "lavfi", "-i", "color=c=black:s=64x64:d=0.2",
+                "-vf", f"subtitles=filename={_filter_value(ass_path)}", "-f", "null", "-"])
+
+@pytest.mark.skipif(not os.path.exists(FONT), reason="DejaVu font not installed")
+def test_word_timing_is_clamped_to_scene(tmp_path):
+    subs_path = tmp_path / "s0.json"
+    subs_path.write_text(json.dumps([
+        {"start": 0.2, "end": 0.22, "word": "quick"},   # shorter than 0.1 s
+        {"start": 1.8, "end": 2.6, "word": "{late}"},   # runs past the scene end
+    ]))
+    ass_path = str(tmp_path / "captions.ass")
+    timeline = [{"text_overlay": ""}, {"text_overlay": "Title"}]
+    FFmpegRenderer(FONT).write_ass(ass_path, timeline, [str(subs_path), None], [1.0, 3.0, 4.0], (1080, 1920))
+
+    words, title = dialogues(ass_path)[:2], dialogues(ass_path)[2]
+    assert [(w[1], w[2], w[9].strip()) for w in words] == [
+        ("0:00:01.20", "0:00:01.30", "QUICK"),
+        ("0:00:02.80", "0:00:03.00", "\\{LATE\\}"),
+    ]
+    assert (title[1], title[2], title[3], title[9].strip()) == ("0:00:03.00", "0:00:04.00", "Title", "TITLE")
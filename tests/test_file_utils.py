@@ -0,0 +1,25 @@
+import json
+import multiprocessing
+
+from file_utils import atomic_write_json, file_lock
+
+def _increment(path, times):
+    for _ in range(times):
+        with file_lock(path):
+            with open(path) as f:
+                count = json.load(f)["count"]
+            atomic_write_json(path, {"count": count + 1})
+
+def test_locked_read_modify_write_loses_no_updates(tmp_path):
+    path = str(tmp_path / "shared" / "counter.json")
+    atomic_write_json(path, {"count": 0})  # creates the directory
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_increment, args=(path, 50)) for _ in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join(30)
+        assert p.exitcode == 0
+    with open(path) as f:
+        assert json.load(f) == {"count": 200}
+    assert sorted(p.name for p in (tmp_path / "shared").iterdir()) == ["counter.json", "counter.json.lock"]
@@ -0,0 +1,147 @@
+import os
+
+import pytest
+
+from asset_store import AssetStore
+from candidate_ranker import CandidateRanker
+from media_fetcher import MediaFetcher
+from phash_index import PerceptualIndex
+from query_index import QueryIndex
+from rate_limiter import ManualClock, RateLimiter
+
+URL = "http://stock.example/clip.mp4"
+
+@pytest.fixture
+def fetcher(tmp_path, monkeypatch):
+    monkeypatch.setenv("MEDIA_INGEST", "range")
+    fetcher = MediaFetcher(vision_model=object(), phash_index=PerceptualIndex(path=None),
+                           asset_store=AssetStore(str(tmp_path / "assets")),
+                           query_index=QueryIndex(library_path=None), ranker=CandidateRanker(log_path=None))
+    fetcher.fetched = []
+
+    def fetch_leading(url, path, seconds):
+        fetcher.fetched.append(seconds)
+        with open(path, "w") as f:
+            f.write(f"first {seconds}s")
+        return True
+
+    def fetch_url(url, path):
+        fetcher.fetched.append("full")
+        with open(path, "w") as f:
+            f.write("full")
+        return True
+
+    monkeypatch.setattr(fetcher, "_supports_range", lambda url: True)
+    monkeypatch.setattr(fetcher, "_fetch_leading", fetch_leading)
+    monkeypatch.setattr(fetcher, "_fetch_url", fetch_url)
+    fetcher.begin_session("test")
+    return fetcher
+
+def download(fetcher, target_dir, duration):
+    target_dir.mkdir(exist_ok=True)
+    path = fetcher._download_file(URL, "clip.mp4", str(target_dir), key="pexels_vid_1", duration=duration)
+    with open(path) as f:
+        return f.read()
+
+def test_trimmed_copy_only_serves_its_own_length(fetcher, tmp_path):
+    assert download(fetcher, tmp_path / "s1", 4.2) == "first 6s"
+    assert download(fetcher, tmp_path / "s2", 4.9) == "first 6s"  # same trim length: store hit
+    assert download(fetcher, tmp_path / "s3", 9.5) == "first 11s"  # never the 6 s copy
+    assert fetcher.fetched == [6, 11]
+
+def test_full_copy_serves_any_length(fetcher, tmp_path):
+    fetcher.ingest_mode = "full"
+    assert download(fetcher, tmp_path / "s1", 4.2) == "full"
+    fetcher.ingest_mode = "range"
+    assert download(fetcher, tmp_path / "s2", 9.5) == "full"
+    assert fetcher.fetched == ["full"]
+
+def test_selection_references_the_trimmed_asset(fetcher, tmp_path):
+    download(fetcher, tmp_path, 4.2)
+    cand = {"id": "pexels_vid_1", "type": "video", "download_url": URL, "image": "thumb"}
+    selection = fetcher._selection(cand, str(tmp_path / "clip.mp4"), duration=4.2)
+    assert selection["asset"] == fetcher.assets.lookup(["url:" + URL + "#t=6"])
+    assert selection["asset"] is not None
+
+class Reply:
+    def __init__(self, content):
+        self.content = content
+
+class Vision:
+    """Answers in order; an Exception instance is raised instead."""
+    def __init__(self, *answers):
+        self.answers = list(answers)
+
+    def invoke(self, messages):
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return Reply(answer)
+
+def candidate(n):
+    return {"id": f"pexels_img_{n}", "type": "image", "image": f"http://stock.example/{n}.jpg",
+            "download_url": f"http://stock.example/{n}_large.jpg", "width": 1080, "height": 1920}
+
+def pick(tmp_path, monkeypatch, vision, count=1):
+    """Runs download_media over `count` candidates; returns (picked ids, verdicts a fresh index sees)."""
+    index_path = str(tmp_path / "phash_index.json")
+    fetcher = MediaFetcher(vision_model=vision, limiter=RateLimiter(rpm=1e6, tpm=1e9, clock=ManualClock()),
+                           phash_index=PerceptualIndex(path=index_path),
+                           asset_store=AssetStore(str(tmp_path / "assets")),
+                           query_index=QueryIndex(library_path=None), ranker=CandidateRanker(log_path=None))
+    cands = [candidate(n) for n in range(count)]
+    hashes = {c["image"]: (n + 1) * 0xFFFF << (n * 16) for n, c in enumerate(cands)}  # far apart
+    monkeypatch.setattr(fetcher, "_search_pexels_videos", lambda term: [])
+    monkeypatch.setattr(fetcher, "_search_ddg_images", lambda term: cands)
+    monkeypatch.setattr(fetcher, "_search_pexels_images", lambda term: [])
+    monkeypatch.setattr(fetcher.phash, "fetch", lambda url: (hashes[url], b"jpg", "image/jpeg"))
+    monkeypatch.setattr(fetcher, "_download_file",
+                        lambda url, filename, target_dir, key=None, duration=None: f"{target_dir}/{filename}")
+    fetcher.begin_session("test")
+    fetcher.download_media(["pug"], str(tmp_path / "out"))
+    saved = PerceptualIndex(path=index_path)
+    return ([s["id"] for s in fetcher.last_selections],
+            [saved.verdict(hashes[c["image"]], "pug") for c in cands])
+
+QUOTA = Exception("429 RESOURCE_EXHAUSTED")
+
+def test_quota_error_leaves_no_verdict(tmp_path, monkeypatch):
+    picked, verdicts = pick(tmp_path, monkeypatch, Vision(*[QUOTA] * 4))
+    assert picked == ["pexels_img_0"]  # still used rather than a black frame
+    assert verdicts == [None]
+
+def test_blocked_response_leaves_no_verdict(tmp_path, monkeypatch):
+    picked, verdicts = pick(tmp_path, monkeypatch, Vision(""))
+    assert picked == ["pexels_img_0"]
+    assert verdicts == [None]
+
+def test_only_model_answers_are_remembered(tmp_path, monkeypatch):
+    picked, verdicts = pick(tmp_path, monkeypatch, Vision("NO", "YES"), count=2)
+    assert picked == ["pexels_img_1"]
+    assert verdicts == ["rejected", "accepted"]
+
+def test_confirmed_match_beats_earlier_unverified(tmp_path, monkeypatch):
+    picked, verdicts = pick(tmp_path, monkeypatch, Vision("", "YES"), count=2)
+    assert picked == ["pexels_img_1"]
+    assert verdicts == [None, "accepted"]
+
+def test_unverified_use_without_vision_model(tmp_path, monkeypatch):
+    picked, verdicts = pick(tmp_path, monkeypatch, None)
+    assert picked == ["pexels_img_0"]
+    assert verdicts == [None]
+
+def test_default_stores_live_under_data_dir(tmp_path, monkeypatch):
+    data_dir = str(tmp_path / "data")
+    fetcher = MediaFetcher(vision_model=object(), data_dir=data_dir)
+    assert fetcher.phash.path == f"{data_dir}/phash_index.json"
+    assert fetcher.assets.root == f"{data_dir}/assets"
+    assert fetcher.query_index.library_path == f"{data_dir}/library.json"
+    assert fetcher.ranker.log_path == f"{data_dir}/candidate_scores.jsonl"
+
+def test_default_data_dir_ignores_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fetcher = MediaFetcher(vision_model=object(), asset_store=AssetStore(str(tmp_path / "assets")))
+    repo_data = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+    assert fetcher.phash.path == os.path.join(repo_data, "phash_index.json")
+    assert fetcher.ranker.log_path == os.path.join(repo_data, "candidate_scores.jsonl")
+    assert not os.path.exists(tmp_path / "data")
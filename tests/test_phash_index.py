@@ -0,0 +1,31 @@
+import multiprocessing
+
+from phash_index import PerceptualIndex, hamming
+
+def _save_verdicts(path, worker, count):
+    index = PerceptualIndex(path=path)
+    for i in range(count):
+        index.mark_rejected(worker << 32 | i, f"w{worker}_{i}", f"query {worker}")
+        index.save()
+
+def test_concurrent_workers_keep_each_others_verdicts(tmp_path):
+    path = str(tmp_path / "phash_index.json")
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_save_verdicts, args=(path, w, 25)) for w in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join(30)
+        assert p.exitcode == 0
+    index = PerceptualIndex(path=path)
+    assert len(index._entries) == 100
+    assert index.verdict(3 << 32 | 7, "Query 3") == "rejected"
+
+def test_used_match_is_per_session():
+    index = PerceptualIndex(path=None, threshold=2)
+    index.mark_used(0b1011, "a")
+    assert index.used_match(0b1000) == "a"
+    assert hamming(0b1011, 0b0100) > 2 and index.used_match(0b0100) is None
+    index.begin_session()
+    assert index.used_match(0b1011) is None
+    assert index.verdict(0b1011, "pug") is None  # using a shot is not a verdict
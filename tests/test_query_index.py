@@ -0,0 +1,51 @@
+import json
+import os
+
+from query_index import QueryIndex, jaccard, query_tokens
+
+def record(video_id, *scenes):
+    return {"id": video_id, "timeline": [
+        {"visual_query": query, "media": {"id": media_id, "type": "video"}} for query, media_id in scenes]}
+
+def write_library(path, records):
+    with open(path, "w") as f:
+        json.dump(records, f)
+
+def test_tokens_ignore_stopwords_digits_and_plurals():
+    assert query_tokens("The Pugs sleeping on a sofa 3") == {"pug", "sleeping", "sofa"}
+    assert query_tokens("grass") == {"grass"}
+    assert jaccard(query_tokens("pug sleeping"), query_tokens("pugs sleeping")) == 1.0
+
+def test_lookup_thresholds():
+    index = QueryIndex(library_path=None, reuse_threshold=0.9, verify_threshold=0.5)
+    index.add_record(record("v1", ("golden retriever running beach", "pexels_vid_1")))
+    media, score = index.lookup("Golden retrievers running on the beach")
+    assert media["id"] == "pexels_vid_1" and score == 1.0
+    media, score = index.lookup("golden retriever running park")
+    assert score == 0.6
+    assert index.lookup("pug sleeping") is None
+
+def test_lookup_skips_excluded_ids_and_prefers_newer_picks():
+    index = QueryIndex(library_path=None, verify_threshold=0.5)
+    index.add_record(record("v1", ("husky snow", "old")))
+    index.add_record(record("v2", ("husky snow", "new")))
+    assert index.lookup("husky snow")[0]["id"] == "new"
+    assert index.lookup("husky snow", exclude_ids={"new"})[0]["id"] == "old"
+    assert index.lookup("husky snow", exclude_ids={"new", "old"}) is None
+
+def test_refresh_indexes_only_new_videos(tmp_path):
+    path = str(tmp_path / "library.json")
+    first = record("v1", ("beagle sniffing", "a"), ("scene without media", None))
+    first["timeline"][1]["media"] = None
+    write_library(path, [first])
+    index = QueryIndex(library_path=path)
+    assert len(index._entries) == 1
+
+    index.refresh()  # unchanged file: nothing re-read
+    assert len(index._entries) == 1
+
+    write_library(path, [first, record("v2", ("pug yawning", "b"))])
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    index.refresh()
+    assert len(index._entries) == 2
+    assert index.lookup("pug yawning")[0]["id"] == "b"
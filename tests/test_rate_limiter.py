@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from rate_limiter import PRIORITY_DIRECTOR, PRIORITY_VERIFY, ManualClock, RateLimiter
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.002)
+
+def start(target, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+def test_rpm_spaces_requests_after_burst():
+    clock = ManualClock()
+    limiter = RateLimiter(rpm=60, tpm=1e9, burst=3, clock=clock)
+    times = []
+    for _ in range(5):
+        limiter.acquire()
+        times.append(clock.now())
+    assert times == pytest.approx([0, 0, 0, 1, 2])
+
+def test_tpm_limits_large_calls_only():
+    clock = ManualClock()
+    # 10 requests/s and 10 tokens/s, both with a capacity of 10
+    limiter = RateLimiter(rpm=600, tpm=600, burst=10, clock=clock)
+    limiter.acquire(tokens=10)
+    limiter.acquire(tokens=10)
+    assert clock.now() == pytest.approx(1.0)
+    limiter.acquire(tokens=5)
+    assert clock.now() == pytest.approx(1.5)
+
+def test_director_jumps_ahead_of_queued_verification():
+    clock = ManualClock(auto_advance=False)
+    limiter = RateLimiter(rpm=60, tpm=1e9, burst=1, clock=clock)
+    limiter.acquire()  # bucket now empty
+    order = []
+
+    def caller(name, priority):
+        limiter.acquire(priority=priority)
+        order.append(name)
+
+    threads = []
+    for i in range(3):
+        threads.append(start(caller, f"verify{i}", PRIORITY_VERIFY))
+        wait_until(lambda: len(limiter._waiters) == i + 1)
+    threads.append(start(caller, "director", PRIORITY_DIRECTOR))
+    wait_until(lambda: len(limiter._waiters) == 4)
+
+    for expected in range(1, 5):
+        clock.advance(1.0)
+        wait_until(lambda: len(order) == expected)
+    for thread in threads:
+        thread.join(1)
+    assert order == ["director", "verify0", "verify1", "verify2"]
+
+def test_retry_after_blocks_every_caller():
+    clock = ManualClock(auto_advance=False)
+    limiter = RateLimiter(rpm=6000, tpm=1e9, burst=100, clock=clock)
+    attempts = []
+    done = []
+
+    def quota_once():
+        attempts.append(clock.now())
+        if len(attempts) == 1:
+            raise Exception("429 RESOURCE_EXHAUSTED. Please retry in 7s.")
+        return "ok"
+
+    def first():
+        done.append(("first", limiter.call(quota_once)))
+
+    def second():
+        limiter.acquire()
+        done.append(("second", clock.now()))
+
+    start(first)
+    wait_until(lambda: limiter.blocked_until == 7.0)
+    start(second)
+    wait_until(lambda: len(limiter._waiters) == 2)
+
+    clock.advance(6.9)
+    time.sleep(0.05)
+    assert done == []
+
+    clock.advance(0.1)
+    wait_until(lambda: len(done) == 2)
+    assert ("first", "ok") in done
+    assert ("second", pytest.approx(7.0)) in done
+    assert attempts == [0.0, pytest.approx(7.0)]
@@ -0,0 +1,60 @@
+import os
+import time
+
+import pytest
+
+from benchmark_fakes import FakeUploader, FakeUploadServer
+from orchestrator import VideoOrchestrator
+from stream_upload import StreamingUpload
+
+CHUNK = 4096
+
+@pytest.fixture
+def server(tmp_path):
+    server = FakeUploadServer(str(tmp_path / "uploads")).start()
+    yield server
+    server.stop()
+
+def write_slowly(path, data, pieces=8):
+    """Appends data in pieces, like an encoder writing fragments."""
+    step = len(data) // pieces + 1
+    with open(path, "wb") as f:
+        for i in range(0, len(data), step):
+            f.write(data[i:i + step])
+            f.flush()
+            time.sleep(0.02)
+
+def make_orchestrator(uploader):
+    # Only the upload step is exercised; the other collaborators are never touched
+    return VideoOrchestrator(director=object(), fetcher=object(), audio_gen=object(), editor=object(),
+                             cloudinary=uploader, library=object(), upload_mode="stream")
+
+def test_streams_chunks_while_the_file_grows(tmp_path, server):
+    path = str(tmp_path / "final.mp4")
+    data = os.urandom(10 * CHUNK + 123)
+    upload = StreamingUpload(path, server.url("upload"), {"public_id": "vid"}, chunk_size=CHUNK,
+                             poll_interval=0.005).start()
+    write_slowly(path, data)
+    url = upload.finish()
+    assert url == "fake://dog_videos/vid"
+    assert upload.chunks >= 10
+    with open(os.path.join(server.root, "vid.mp4"), "rb") as f:
+        assert f.read() == data
+
+def test_mid_stream_failure_falls_back_to_file_upload(tmp_path):
+    server = FakeUploadServer(str(tmp_path / "uploads"), fail_after=3).start()
+    try:
+        uploader = FakeUploader(server.url("upload"))
+        path = str(tmp_path / "final.mp4")
+        data = os.urandom(10 * CHUNK)
+        upload = StreamingUpload(path, server.url("upload"), {"public_id": "vid"}, chunk_size=CHUNK,
+                                 poll_interval=0.005).start()
+        write_slowly(path, data)
+
+        url = make_orchestrator(uploader)._upload_output(path, "vid", upload)
+        assert upload.error is not None  # the server started failing mid-stream
+        assert not os.path.exists(os.path.join(server.root, "vid.mp4"))
+        assert url == "fake://dog_videos/vid"
+        assert uploader.uploaded_bytes == len(data)  # the finished file went up instead
+    finally:
+        server.stop()
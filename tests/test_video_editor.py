@@ -0,0 +1,82 @@
+import pytest
+
+import video_editor
+from video_editor import OUTPUT_PRESETS, VideoAssembler, _ClipPool
+
+class Resource:
+    """A reader that records whether it is still open."""
+    def __init__(self, key, alive):
+        self.key, self.alive = key, alive
+        alive.add(self)
+
+    def get_frame(self, t):
+        return self.key
+
+    def close(self):
+        self.alive.discard(self)
+
+class CountingOpener:
+    def __init__(self):
+        self.alive = set()
+        self.opened = []
+        self.max_alive = 0
+
+    def __call__(self, key):
+        clip = Resource(key, self.alive)
+        extra = Resource(key, self.alive)  # e.g. the source under a composite
+        self.opened += [clip, extra]
+        self.max_alive = max(self.max_alive, len(self.alive))
+        return clip, [clip, extra]
+
+def test_single_format_renders_at_its_own_geometry(monkeypatch):
+    monkeypatch.setenv("OUTPUT_FORMATS", "landscape")
+    editor = VideoAssembler()
+    assert editor.output_targets == {"landscape": OUTPUT_PRESETS["landscape"]}
+    assert editor.target_resolution == (1920, 1080)
+
+def test_primary_format_is_the_first_listed(monkeypatch):
+    monkeypatch.setenv("OUTPUT_FORMATS", "square,short")
+    assert VideoAssembler().target_resolution == (1080, 1080)
+
+def test_unknown_formats_fall_back_to_short(monkeypatch):
+    monkeypatch.setenv("OUTPUT_FORMATS", "cinema")
+    editor = VideoAssembler()
+    assert list(editor.output_targets) == ["short"]
+    assert editor.target_resolution == (1080, 1920)
+
+def test_clip_pool_keeps_at_most_capacity_alive():
+    opener = CountingOpener()
+    pool = _ClipPool(2, opener)
+    for key in [0, 1, 0, 2, 3, 1, 1]:
+        assert pool.get(key).key == key
+    assert opener.max_alive == 2 * 2
+    assert pool.opened == 5  # 0 stays warm for its second use; 1 is reopened after eviction
+    pool.close_all()
+    assert not opener.alive and not pool.items
+
+class FailingClip:
+    """Stands in for VideoClip: pulls frames like the writer, then fails mid-render."""
+    def __init__(self, frame_function, duration):
+        self.frame_function, self.duration = frame_function, duration
+
+    def write_videofile(self, *args, **kwargs):
+        for n in range(int(self.duration * 24)):
+            self.frame_function(n / 24)
+        raise RuntimeError("disk full")
+
+def test_streaming_closes_every_reader_when_render_raises(tmp_path, monkeypatch):
+    editor = VideoAssembler()
+    editor.max_open_readers = 2
+    opener = CountingOpener()
+    track = tmp_path / "track.mp3"
+    track.write_bytes(b"")
+    monkeypatch.setattr(editor, "_narration_track", lambda entries, output_path: (str(track), [1.0] * 5, "copy"))
+    monkeypatch.setattr(editor, "_build_scene", lambda scene, media, subs, duration: opener(len(opener.opened) // 2))
+    monkeypatch.setattr(video_editor, "VideoClip", FailingClip)
+
+    with pytest.raises(RuntimeError, match="disk full"):
+        editor._assemble_streaming([{}] * 5, [None] * 5, ["a.mp3"] * 5, str(tmp_path / "out.mp4"))
+    assert len(opener.opened) == 2 * 5
+    assert opener.max_alive <= 2 * 2
+    assert not opener.alive
+    assert not track.exists()
@@ -1,128 +1,503 @@
-from moviepy import VideoFileClip, ImageClip, AudioFileClip, concatenate_videoclips, CompositeVideoClip, TextClip, ColorClip, vfx
+from moviepy import VideoFileClip, ImageClip, concatenate_videoclips, CompositeVideoClip, TextClip, ColorClip, vfx
+from moviepy import VideoClip
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+from collections import OrderedDict
+from PIL import Image
+import numpy as np
+import bisect
 import os
 import json
+import queue
+import threading
+from typing import Optional
+
+from audio_generator import build_narration_track
+from ffmpeg_renderer import FFmpegRenderer
+from resource_monitor import ResourceMonitor
+
+# Named output geometries for multi-format renders (OUTPUT_FORMATS=short,square,landscape)
+OUTPUT_PRESETS = {
+    "short": (1080, 1920),
+    "square": (1080, 1080),
+    "landscape": (1920, 1080),
+}
+
+class _ClipPool:
+    """
+    Opens scene resources on demand and keeps at most `capacity` of them alive,
+    closing the least recently used one deterministically when a new one is needed.
+    opener(key) -> (value, [clips to close])
+    """
+    def __init__(self, capacity: int, opener):
+        self.capacity = max(1, capacity)
+        self.opener = opener
+        self.items = OrderedDict()
+        self.opened = 0
+
+    def get(self, key):
+        if key in self.items:
+            self.items.move_to_end(key)
+            return self.items[key][0]
+        while len(self.items) >= self.capacity:
+            self._close(next(iter(self.items)))
+        value, resources = self.opener(key)
+        self.items[key] = (value, resources)
+        self.opened += 1
+        return value
+
+    def _close(self, key):
+        _, resources = self.items.pop(key)
+        for clip in resources:
+            clip.close()
+
+    def close_all(self):
+        for key in list(self.items):
+            self._close(key)
 
 class VideoAssembler:
     def __init__(self):
         self.target_resolution = (1080, 1920) # Vertical 9:16
         # Using absolute path to ensure MoviePy/ImageMagick finds it
-        self.font = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf" 
+        self.font = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
         self.font_bold = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+        self.fps = 24
+
+        # "classic" keeps every scene open in one concatenate_videoclips,
+        # "streaming" opens each scene's readers only while it is rendered,
+        # "auto" streams timelines longer than streaming_min_scenes.
+        self.assembly_mode = os.getenv("ASSEMBLY_MODE", "auto")
+        self.streaming_min_scenes = 8
+        self.max_open_readers = int(os.getenv("MAX_OPEN_READERS", "4"))
+
+        # Geometries rendered by assemble_multi_format; the first one is the primary video
+        formats = [f.strip() for f in os.getenv("OUTPUT_FORMATS", "short").split(",") if f.strip()]
+        self.output_targets = {name: OUTPUT_PRESETS[name] for name in formats if name in OUTPUT_PRESETS}
+        if not self.output_targets:
+            self.output_targets = {"short": self.target_resolution}
+        # Single-output renders use the primary format's geometry (OUTPUT_FORMATS=landscape is landscape)
+        self.target_resolution = next(iter(self.output_targets.values()))
+
+        # "moviepy" composites frames in Python; "ffmpeg" renders the timeline as one
+        # filtergraph with libass captions (see ffmpeg_renderer.py). Overridable per job.
+        self.render_backend = os.getenv("RENDER_BACKEND", "moviepy")
+
+        # Fragmented MP4 is append-only, so it can be uploaded while it is written (UPLOAD_MODE=stream)
+        self.fragmented_output = False
 
-    def assemble_video_from_timeline(self, timeline: list, media_paths: list, audio_data: list, output_path: str):
+        # Peak RSS / FD usage of the last render (see ResourceMonitor)
+        self.last_render_stats = {}
+
+    def _ffmpeg_params(self):
+        if self.fragmented_output:
+            return ["-movflags", "frag_keyframe+empty_moov+default_base_moof"]
+        return None
+
+    def _load_visual(self, media_path, duration: float):
         """
-        Assembles video based on the structured timeline.
-        media_paths[i]: path to video/image
-        audio_data[i]: tuple (audio_path, subtitles_path)
+        Loads the media for one scene, cropped to target_resolution.
+        Returns (clip, [source clips to close when done]).
         """
-        final_clips = []
-        
-        for i, scene in enumerate(timeline):
-            media_path = media_paths[i]
-            # Unpack audio data
-            if isinstance(audio_data[i], tuple):
-                audio_path, subs_path = audio_data[i]
+        if media_path and os.path.exists(media_path):
+            if media_path.endswith(('.jpg', '.jpeg', '.png')):
+                original_clip = ImageClip(media_path).with_duration(duration)
+                resources = [original_clip]
+            elif media_path.endswith(('.mp4', '.mov')):
+                # Source audio is replaced by narration; audio=False avoids a second ffmpeg reader
+                source_clip = VideoFileClip(media_path, audio=False)
+                resources = [source_clip]
+                if source_clip.duration < duration:
+                    original_clip = source_clip.with_effects([vfx.Loop(duration=duration)])
+                else:
+                    original_clip = source_clip.subclipped(0, duration)
             else:
-                audio_path = audio_data[i]
-                subs_path = None
-
-            # 1. Load Audio
-            audio_clip = AudioFileClip(audio_path)
-            duration = audio_clip.duration
-            
-            # 2. Visual Clip
-            visual_clip = None
-            if media_path and os.path.exists(media_path):
-                if media_path.endswith(('.jpg', '.jpeg', '.png')):
-                    original_clip = ImageClip(media_path).with_duration(duration)
-                    # Smart Crop Logic
-                    w, h = original_clip.size
-                    if w/h > 1080/1920:
-                        visual_clip = original_clip.with_effects([vfx.Resize(height=1920)])
-                        visual_clip = visual_clip.with_effects([vfx.Crop(width=1080, height=1920, x_center=visual_clip.w/2)])
-                    else:
-                        visual_clip = original_clip.with_effects([vfx.Resize(width=1080)])
-                        visual_clip = visual_clip.with_effects([vfx.Crop(width=1080, height=1920, y_center=visual_clip.h/2)])
-                        
-                elif media_path.endswith(('.mp4', '.mov')):
-                    original_clip = VideoFileClip(media_path)
-                    if original_clip.duration < duration:
-                        original_clip = original_clip.with_effects([vfx.Loop(duration=duration)])
-                    else:
-                        original_clip = original_clip.subclipped(0, duration)
-                    
-                    # Smart Crop Logic
-                    w, h = original_clip.size
-                    if w/h > 1080/1920:
-                        visual_clip = original_clip.with_effects([vfx.Resize(height=1920)])
-                        visual_clip = visual_clip.with_effects([vfx.Crop(width=1080, height=1920, x_center=visual_clip.w/2)])
-                    else:
-                         visual_clip = original_clip.with_effects([vfx.Resize(width=1080)])
-                         visual_clip = visual_clip.with_effects([vfx.Crop(width=1080, height=1920, y_center=visual_clip.h/2)])
+                return ColorClip(size=self.target_resolution, color=(0,0,0), duration=duration), []
+
+            # Smart Crop Logic
+            target_w, target_h = self.target_resolution
+            w, h = original_clip.size
+            if w/h > target_w/target_h:
+                visual_clip = original_clip.with_effects([vfx.Resize(height=target_h)])
+                visual_clip = visual_clip.with_effects([vfx.Crop(width=target_w, height=target_h, x_center=visual_clip.w/2)])
             else:
-                 visual_clip = ColorClip(size=self.target_resolution, color=(0,0,0), duration=duration)
+                visual_clip = original_clip.with_effects([vfx.Resize(width=target_w)])
+                visual_clip = visual_clip.with_effects([vfx.Crop(width=target_w, height=target_h, y_center=visual_clip.h/2)])
+            return visual_clip, resources
 
-            visual_clip = visual_clip.with_audio(audio_clip)
+        return ColorClip(size=self.target_resolution, color=(0,0,0), duration=duration), []
 
-            # 3. Dynamic Subtitles (YouTube Shorts Style)
-            captions = []
-            
-            if subs_path and os.path.exists(subs_path):
-                try:
-                    with open(subs_path, 'r') as f:
-                        processed_subs = json.load(f)
-                    
-                    for sub in processed_subs:
-                        word = sub['word']
-                        start = sub['start']
-                        end = sub['end']
-                        duration_sub = end - start
-                        
-                        if duration_sub < 0.1: duration_sub = 0.1
-
-                        txt_clip = TextClip(
-                            text=word.upper(), 
-                            font_size=105, 
-                            color='yellow', 
-                            font=self.font_bold, 
-                            stroke_color='black', 
-                            stroke_width=5, 
-                            size=(1000, None), 
-                            method='caption',
-                            text_align='center'
-                        )
-                        txt_clip = txt_clip.with_start(start).with_duration(duration_sub).with_position('center')
-                        captions.append(txt_clip)
-                        
-                except Exception as e:
-                    print(f"   ⚠️ Subtitle JSON Error: {e}")
-
-            # 4. Emphasis Text Overlay (from Agent)
-            top_overlay = scene.get('text_overlay', "")
-            if top_overlay:
-                 try:
-                    title_clip = TextClip(
-                        text=top_overlay.upper(),
-                        font_size=90, 
-                        color='white', 
+    def _build_captions(self, scene: dict, subs_path, duration: float) -> list:
+        captions = []
+
+        # 3. Dynamic Subtitles (YouTube Shorts Style)
+        if subs_path and os.path.exists(subs_path):
+            try:
+                with open(subs_path, 'r') as f:
+                    processed_subs = json.load(f)
+
+                for sub in processed_subs:
+                    word = sub['word']
+                    start = sub['start']
+                    end = sub['end']
+                    duration_sub = end - start
+
+                    if duration_sub < 0.1: duration_sub = 0.1
+
+                    txt_clip = TextClip(
+                        text=word.upper(),
+                        font_size=105,
+                        color='yellow',
                         font=self.font_bold,
                         stroke_color='black',
-                        stroke_width=6,
-                        size=(self.target_resolution[0] - 100, None),
+                        stroke_width=5,
+                        size=(1000, None),
                         method='caption',
                         text_align='center'
                     )
-                    title_clip = title_clip.with_position(('center', 200)).with_duration(duration)
-                    captions.append(title_clip)
-                 except Exception as e:
-                    print(f"   ⚠️ Title Error: {e}")
+                    txt_clip = txt_clip.with_start(start).with_duration(duration_sub).with_position('center')
+                    captions.append(txt_clip)
+
+            except Exception as e:
+                print(f"   ⚠️ Subtitle JSON Error: {e}")
+
+        # 4. Emphasis Text Overlay (from Agent)
+        top_overlay = scene.get('text_overlay', "")
+        if top_overlay:
+             try:
+                title_clip = TextClip(
+                    text=top_overlay.upper(),
+                    font_size=90,
+                    color='white',
+                    font=self.font_bold,
+                    stroke_color='black',
+                    stroke_width=6,
+                    size=(self.target_resolution[0] - 100, None),
+                    method='caption',
+                    text_align='center'
+                )
+                title_clip = title_clip.with_position(('center', 200)).with_duration(duration)
+                captions.append(title_clip)
+             except Exception as e:
+                print(f"   ⚠️ Title Error: {e}")
+
+        return captions
+
+    def _build_scene(self, scene: dict, media_path, subs_path, duration: float):
+        """Visual + captions for one scene (no audio). Returns (clip, resources)."""
+        visual_clip, resources = self._load_visual(media_path, duration)
+        captions = self._build_captions(scene, subs_path, duration)
+        # Composite everything
+        if captions:
+            visual_clip = CompositeVideoClip([visual_clip, *captions])
+        return visual_clip, resources
+
+    @staticmethod
+    def _unpack_audio(entry):
+        # audio_data[i] is either (audio_path, subtitles_path) or just audio_path
+        if isinstance(entry, tuple):
+            return entry
+        return entry, None
 
-            # Composite everything
-            if captions:
-                visual_clip = CompositeVideoClip([visual_clip, *captions])
+    def _narration_track(self, entries: list, output_path: str):
+        """
+        One prebuilt narration track for the final mux, plus each scene's exact length
+        (see build_narration_track). Scenes are cut to these lengths, so captions and
+        shots stay on the narration with no per-scene audio clips in the render loop.
+        Returns (track path, durations, audio codec for the mux).
+        """
+        base = os.path.splitext(output_path)[0] + "_narration"
+        track_path, durations = build_narration_track([audio_path for audio_path, _ in entries], base)
+        # MP3 frames are muxed as is; the PCM fallback is encoded by the writer
+        codec = "copy" if track_path.endswith(".mp3") else "aac"
+        return track_path, durations, codec
 
-            final_clips.append(visual_clip)
+    def assemble_video_from_timeline(self, timeline: list, media_paths: list, audio_data: list, output_path: str,
+                                     backend: Optional[str] = None):
+        """
+        Assembles video based on the structured timeline.
+        media_paths[i]: path to video/image
+        audio_data[i]: tuple (audio_path, subtitles_path)
+        backend: "moviepy" or "ffmpeg" (default: self.render_backend)
+        """
+        if (backend or self.render_backend) == "ffmpeg":
+            return self._assemble_ffmpeg(timeline, media_paths, audio_data,
+                                         {output_path: self.target_resolution}, "ffmpeg")
 
-        # Concatenate
-        final_video = concatenate_videoclips(final_clips, method="compose")
-        final_video.write_videofile(output_path, fps=24)
+        streaming = self.assembly_mode == "streaming" or (
+            self.assembly_mode == "auto" and len(timeline) > self.streaming_min_scenes)
+
+        with ResourceMonitor() as monitor:
+            if streaming:
+                self._assemble_streaming(timeline, media_paths, audio_data, output_path)
+            else:
+                self._assemble_classic(timeline, media_paths, audio_data, output_path)
+
+        self.last_render_stats = {"mode": "streaming" if streaming else "classic", **monitor.stats()}
+        print(f"   📈 Render stats: {self.last_render_stats}")
+
+    def _assemble_classic(self, timeline: list, media_paths: list, audio_data: list, output_path: str):
+        """Every scene open at once inside one concatenate_videoclips."""
+        entries = [self._unpack_audio(entry) for entry in audio_data]
+        final_clips = []
+        opened = []
+
+        # 1. Narration: one track, scene lengths from its frames
+        track_path, durations, audio_codec = self._narration_track(entries, output_path)
+        try:
+            for i, scene in enumerate(timeline):
+                # 2. Visual Clip + captions
+                visual_clip, resources = self._build_scene(scene, media_paths[i], entries[i][1], durations[i])
+                opened.extend(resources)
+                final_clips.append(visual_clip)
+
+            # Concatenate
+            final_video = concatenate_videoclips(final_clips, method="compose")
+            final_video.write_videofile(output_path, fps=self.fps, audio=track_path, audio_codec=audio_codec,
+                                        ffmpeg_params=self._ffmpeg_params())
+        finally:
+            for clip in opened:
+                clip.close()
+            os.remove(track_path)
+
+    def _assemble_streaming(self, timeline: list, media_paths: list, audio_data: list, output_path: str):
+        """
+        Constant-memory assembly: scene readers are opened lazily while the writer
+        reaches that scene and closed as soon as they fall out of a small LRU pool,
+        so at most max_open_readers ffmpeg readers exist regardless of timeline length.
+        Narration is one prebuilt track muxed by the writer (no audio readers).
+        """
+        entries = [self._unpack_audio(entry) for entry in audio_data]
+        video_slots = max(1, self.max_open_readers)
+
+        # Scene offsets come from the narration track, frame-exact
+        track_path, durations, audio_codec = self._narration_track(entries, output_path)
+        starts = [0.0]
+        for d in durations:
+            starts.append(starts[-1] + d)
+        total = starts[-1]
+
+        def open_scene(i):
+            return self._build_scene(timeline[i], media_paths[i], entries[i][1], durations[i])
+
+        video_pool = _ClipPool(video_slots, open_scene)
+
+        def frame_function(t):
+            i = min(bisect.bisect_right(starts, t) - 1, len(durations) - 1)
+            clip = video_pool.get(i)
+            local_t = min(t - starts[i], max(0.0, durations[i] - 1.0 / self.fps))
+            return clip.get_frame(local_t)
+
+        try:
+            final_video = VideoClip(frame_function=frame_function, duration=total)
+            final_video.write_videofile(output_path, fps=self.fps, audio=track_path, audio_codec=audio_codec,
+                                        ffmpeg_params=self._ffmpeg_params())
+        finally:
+            video_pool.close_all()
+            os.remove(track_path)
+        print(f"   ♻️ Streaming assembly: opened {video_pool.opened} scene readers (max {video_slots} alive)")
+
+    def _assemble_ffmpeg(self, timeline: list, media_paths: list, audio_data: list, outputs: dict, mode: str):
+        """Renders through FFmpegRenderer: one ffmpeg process, no frames in Python."""
+        entries = [self._unpack_audio(entry) for entry in audio_data]
+        renderer = FFmpegRenderer(self.font_bold, fps=self.fps)
+        first_output = next(iter(outputs))
+        work_dir = os.path.dirname(os.path.abspath(first_output))
+        with ResourceMonitor() as monitor:
+            # Scene cuts come from the same track the outputs carry
+            track_path, durations, _ = self._narration_track(entries, first_output)
+            try:
+                renderer.render(timeline, media_paths, track_path, [s for _, s in entries],
+                                durations, outputs, work_dir, ffmpeg_params=self._ffmpeg_params())
+            finally:
+                os.remove(track_path)
+        self.last_render_stats = {"mode": mode, **monitor.stats()}
+        print(f"   📈 Render stats: {self.last_render_stats}")
+
+    # ---- Multi-format: one decode pass, one encoder per output geometry ----
+
+    def _caption_layers(self, scene: dict, subs_path, duration: float, size) -> list:
+        """
+        Pre-renders the scene's captions for one output geometry.
+        Returns [(start, end, x, y, rgb, alpha)], drawn in order (title last, on top).
+        Font sizes scale with the short side so square/landscape keep the Shorts look.
+        """
+        w, h = size
+        scale = min(w, h) / 1080
+        specs = []
+        if subs_path and os.path.exists(subs_path):
+            try:
+                with open(subs_path, 'r') as f:
+                    for sub in json.load(f):
+                        specs.append((sub['word'], sub['start'], sub['start'] + max(sub['end'] - sub['start'], 0.1),
+                                      105, 'yellow', 5, min(int(1000 * scale), w - 80), None))
+            except Exception as e:
+                print(f"   ⚠️ Subtitle JSON Error: {e}")
+        top_overlay = scene.get('text_overlay', "")
+        if top_overlay:
+            specs.append((top_overlay, 0.0, duration, 90, 'white', 6, w - int(100 * scale), int(200 * h / 1920)))
+
+        cache = {}
+        layers = []
+        for text, start, end, font_size, color, stroke, box_w, y in specs:
+            key = (text.upper(), font_size, color, stroke, box_w)
+            if key not in cache:
+                try:
+                    clip = TextClip(text=text.upper(), font_size=int(font_size * scale), color=color,
+                                    font=self.font_bold, stroke_color='black', stroke_width=max(1, int(stroke * scale)),
+                                    size=(box_w, None), method='caption', text_align='center')
+                    cache[key] = (clip.get_frame(0).astype(np.float32), clip.mask.get_frame(0)[..., None].astype(np.float32))
+                except Exception as e:
+                    print(f"   ⚠️ Caption Error: {e}")
+                    cache[key] = None
+            if cache[key] is None:
+                continue
+            rgb, alpha = cache[key]
+            x = (w - rgb.shape[1]) // 2
+            layer_y = (h - rgb.shape[0]) // 2 if y is None else y
+            layers.append((start, end, x, layer_y, rgb, alpha))
+        return layers
+
+    @staticmethod
+    def _blend(frame: np.ndarray, x: int, y: int, rgb: np.ndarray, alpha: np.ndarray):
+        """Alpha-blends rgb onto frame in place, clipped to the frame bounds."""
+        h, w = frame.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + rgb.shape[1], w), min(y + rgb.shape[0], h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        src = rgb[y0 - y:y1 - y, x0 - x:x1 - x]
+        a = alpha[y0 - y:y1 - y, x0 - x:x1 - x]
+        region = frame[y0:y1, x0:x1].astype(np.float32)
+        frame[y0:y1, x0:x1] = (region * (1 - a) + src * a).astype(np.uint8)
+
+    @staticmethod
+    def _fit(frame, size) -> np.ndarray:
+        """Cover-crop + resize a source frame to size (same smart crop as _load_visual)."""
+        w, h = size
+        if frame is None:
+            return np.zeros((h, w, 3), dtype=np.uint8)
+        src_h, src_w = frame.shape[:2]
+        scale = max(w / src_w, h / src_h)
+        crop_w, crop_h = w / scale, h / scale
+        left, top = (src_w - crop_w) / 2, (src_h - crop_h) / 2
+        image = Image.fromarray(frame[..., :3])
+        image = image.resize((w, h), Image.BILINEAR, box=(left, top, left + crop_w, top + crop_h))
+        return np.asarray(image).copy()
+
+    def _target_worker(self, size, writer, frames: queue.Queue, scenes: list, errors: list):
+        """Consumes shared decoded frames and writes one output geometry."""
+        current, layers, static_base = None, [], None
+        while True:
+            item = frames.get()
+            if item is None:
+                return
+            if errors:
+                continue  # keep draining so the decoder never blocks
+            try:
+                i, local_t, frame, static = item
+                if i != current:
+                    current, static_base = i, None
+                    scene, subs_path, duration = scenes[i]
+                    layers = self._caption_layers(scene, subs_path, duration, size)
+                if static and static_base is not None:
+                    out = static_base.copy()
+                else:
+                    out = self._fit(frame, size)
+                    if static:
+                        static_base = out.copy()
+                for start, end, x, y, rgb, alpha in layers:
+                    if start <= local_t < end:
+                        self._blend(out, x, y, rgb, alpha)
+                writer.write_frame(out)
+            except Exception as e:
+                errors.append(e)
+
+    def assemble_multi_format(self, timeline: list, media_paths: list, audio_data: list, output_paths: dict,
+                              backend: Optional[str] = None):
+        """
+        Renders several output geometries from ONE decode of every source frame.
+        output_paths: {target name: file path}, names from self.output_targets.
+        Each target gets its own crop and caption layout and its own encoder thread;
+        narration is joined once (_narration_track) and muxed into every output.
+        """
+        targets = {name: self.output_targets[name] for name in output_paths}
+        if (backend or self.render_backend) == "ffmpeg":
+            self._assemble_ffmpeg(timeline, media_paths, audio_data,
+                                  {output_paths[name]: size for name, size in targets.items()}, "ffmpeg_multi_format")
+            return output_paths
+
+        entries = [self._unpack_audio(entry) for entry in audio_data]
+        first_output = next(iter(output_paths.values()))
+
+        with ResourceMonitor() as monitor:
+            track_path, durations, audio_codec = self._narration_track(entries, first_output)
+            starts = [0.0]
+            for d in durations:
+                starts.append(starts[-1] + d)
+            scenes = [(timeline[i], entries[i][1], durations[i]) for i in range(len(timeline))]
+
+            errors = []
+            workers = []
+            for name, size in targets.items():
+                writer = FFMPEG_VideoWriter(output_paths[name], size, self.fps, codec="libx264",
+                                            audiofile=track_path, audio_codec=audio_codec, preset="medium",
+                                            ffmpeg_params=self._ffmpeg_params())
+                frames = queue.Queue(maxsize=8)
+                thread = threading.Thread(target=self._target_worker,
+                                          args=(size, writer, frames, scenes, errors), daemon=True)
+                thread.start()
+                workers.append((name, writer, frames, thread))
+
+            source, resources, current = None, [], None
+            try:
+                total_frames = int(round(starts[-1] * self.fps))
+                print(f"   🎞️ Multi-format render: {total_frames} frames -> {', '.join(targets)}")
+                for k in range(total_frames):
+                    t = k / self.fps
+                    i = min(bisect.bisect_right(starts, t) - 1, len(durations) - 1)
+                    if i != current:
+                        for clip in resources:
+                            clip.close()
+                        current = i
+                        source, resources, static = self._open_source(media_paths[i], durations[i])
+                    local_t = t - starts[i]
+                    frame = None
+                    if source is not None:
+                        frame = source.get_frame(min(local_t, max(0.0, durations[i] - 1.0 / self.fps)))
+                    for _, _, frames, _ in workers:
+                        frames.put((i, local_t, frame, static))
+                    if errors:
+                        break
+            finally:
+                for clip in resources:
+                    clip.close()
+                for _, writer, frames, thread in workers:
+                    frames.put(None)
+                    thread.join()
+                    writer.close()
+                if os.path.exists(track_path):
+                    os.remove(track_path)
+
+            if errors:
+                raise errors[0]
+
+        self.last_render_stats = {"mode": "multi_format", "outputs": list(targets), **monitor.stats()}
+        print(f"   📈 Render stats: {self.last_render_stats}")
+        return output_paths
+
+    def _open_source(self, media_path, duration: float):
+        """
+        Raw (uncropped) source for one scene: (clip or None, [clips to close], is_static).
+        Cropping happens per output geometry in _fit.
+        """
+        if media_path and os.path.exists(media_path):
+            if media_path.endswith(('.jpg', '.jpeg', '.png')):
+                clip = ImageClip(media_path).with_duration(duration)
+                return clip, [clip], True
+            if media_path.endswith(('.mp4', '.mov')):
+                source_clip = VideoFileClip(media_path, audio=False)
+                if source_clip.duration < duration:
+                    clip = source_clip.with_effects([vfx.Loop(duration=duration)])
+                else:
+                    clip = source_clip.subclipped(0, duration)
+                return clip, [source_clip], False
+        return None, [], True